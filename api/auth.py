@@ -1,18 +1,55 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import math
+import asyncio
+from fastapi import APIRouter, HTTPException, Request, status, Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from pymongo.errors import DuplicateKeyError
 from app.model.user import UserCreate, UserInDB, Token
 from app.model.readers import Reader
 from app.model.author import Author
-from app.crud.user import create_user, find_user_by_username
+from app.crud.user import create_user, find_user_by_username, update_user_password_hash
 from app.crud.readers import create_reader
 from app.crud.authors import create_author
-from app.auth_utils import hash_password, verify_password, create_access_token, decode_access_token
+from app.auth_utils import (
+    hash_password_async, verify_and_update_password_async, PasswordHasherBusy,
+    create_access_token, decode_access_token
+)
+from app.services.rate_limit import RateLimit, rate_limiter
 
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Returned when the password hashing pool is saturated
+HASHER_BUSY = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many login attempts in progress, please retry shortly",
+    headers={"Retry-After": "1"},
+)
+
+# Throttling for the credential endpoints. The per-IP bucket stops one client hammering many
+# accounts, the per-username bucket stops a botnet hammering one account. Both are checked
+# before any user lookup or bcrypt work happens.
+LOGIN_IP_LIMIT = RateLimit(capacity=20, period_seconds=60)
+LOGIN_USERNAME_LIMIT = RateLimit(capacity=5, period_seconds=60)
+REGISTER_IP_LIMIT = RateLimit(capacity=5, period_seconds=3600)
+REGISTER_USERNAME_LIMIT = RateLimit(capacity=3, period_seconds=3600)
+
+
+async def _enforce_rate_limit(key: str, limit: RateLimit):
+    retry_after = await rate_limiter.hit(key, limit)
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please retry later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
 async def get_current_user(token : str = Depends(oauth2_scheme)):
     """
     This is a DEPENDENCY. Any route that includes 'Depends(get_current_user)'
@@ -47,16 +84,14 @@ async def get_current_user(token : str = Depends(oauth2_scheme)):
 
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register(user: UserCreate):
-    #1. Check if user already exists
-    existing = await find_user_by_username(user.username)
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
-        )
+async def register(user: UserCreate, request: Request):
+    await _enforce_rate_limit(f"register:ip:{_client_ip(request)}", REGISTER_IP_LIMIT)
+    await _enforce_rate_limit(f"register:user:{user.username.lower()}", REGISTER_USERNAME_LIMIT)
 
-    hashed = hash_password(user.password)
+    try:
+        hashed = await hash_password_async(user.password)
+    except PasswordHasherBusy:
+        raise HASHER_BUSY
 
     user_in_db = UserInDB(
         username=user.username,
@@ -64,8 +99,15 @@ async def register(user: UserCreate):
         hashed_password=hashed,
         roles=user.roles)
 
-    # Save User to MongoDB
-    user_id = await create_user(user_in_db)
+    # Save User to MongoDB. The unique index on username rejects duplicates atomically,
+    # so there is no separate existence check (and no race between check and insert)
+    try:
+        user_id = await create_user(user_in_db)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already taken"
+        )
 
     # Auto-create a Reader profile for every user
     reader_profile = Reader(
@@ -75,7 +117,7 @@ async def register(user: UserCreate):
         finished=[],
         user_id=user.username
     )
-    await create_reader(reader_profile)
+    profiles = [create_reader(reader_profile)]
 
     # If the user registered as an author, also create an Author profile
     if "author" in user.roles:
@@ -86,26 +128,40 @@ async def register(user: UserCreate):
             profile_picture=None,
             user_id=user.username
         )
-        await create_author(author_profile)
+        profiles.append(create_author(author_profile))
+
+    # The profiles are independent documents, write them concurrently
+    await asyncio.gather(*profiles)
 
     return {"id": user_id, "status": "registered"}
 
 @router.post("/login", response_model = Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """
     OAuth2PasswordRequestForm expects form fields: 'username' and 'password'.
     This is a standard that Swagger UI knows how to work with automatically.
     """
+    await _enforce_rate_limit(f"login:ip:{_client_ip(request)}", LOGIN_IP_LIMIT)
+    await _enforce_rate_limit(f"login:user:{form_data.username.lower()}", LOGIN_USERNAME_LIMIT)
+
     user = await find_user_by_username(form_data.username)
     if not user: 
         raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED, 
         detail="Incorrect username or password")
     
-    #2. Check the password
-    if not verify_password(form_data.password, user["hashed_password"]):
+    #2. Check the password (off the event loop — bcrypt is slow on purpose)
+    try:
+        password_ok, new_hash = await verify_and_update_password_async(form_data.password, user["hashed_password"])
+    except PasswordHasherBusy:
+        raise HASHER_BUSY
+    if not password_ok:
         raise HTTPException(status_code = status.HTTP_401_UNAUTHORIZED,
         detail="Incorrect username or password")
 
+    # The stored hash was made with an older cost factor, swap it for one at the current cost
+    if new_hash:
+        await update_user_password_hash(user["username"], new_hash)
+
     #3. Create the JWT with the user's info embedded
     access_token = create_access_token(data={"sub": user["username"], "roles": user["roles"]})
 
@@ -1,10 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from app.model.author import Author
 from app.crud.authors import (
     create_author, get_author, delete_author, update_author,
     list_authors, get_author_by_user_id, search_authors_by_name
 )
-from app.crud.books import get_books_by_ids
+from app.crud.books import list_books_by_author
 from api.auth import get_current_user
 
 router = APIRouter(prefix="/authors", tags=["Authors"])
@@ -47,17 +47,21 @@ async def read_author(id: str):
     return author
 
 @router.get("/{id}/books")
-async def get_author_books(id: str):
-    """Get all books by a specific author, with full book details."""
-    author = await get_author(id)
+async def get_author_books(
+    id: str,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=100),
+):
+    """Get one page of books by a specific author (card view)."""
+    try:
+        author = await get_author(id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not author:
         raise HTTPException(status_code=404, detail="Author Not Found")
-    
-    if not author.get("book_list"):
-        return {"books": [], "author": author["name"]}
-    
-    books = await get_books_by_ids(author["book_list"])
-    return {"books": books, "author": author["name"]}
+
+    books = await list_books_by_author(id, author.get("book_list") or [], skip=skip, limit=limit)
+    return {"books": books, "author": author["name"], "skip": skip, "limit": limit}
 
 @router.put("/{id}")
 async def modify_author(id: str, author: Author, current_user: dict = Depends(get_current_user)):
@@ -1,17 +1,28 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+import hashlib
+import os
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response, BackgroundTasks
+from fastapi.responses import StreamingResponse, FileResponse
+from app.responses import OrjsonResponse, dumps
 from app.crud.books import (
-    create_book, update_book, delete_book,
-    get_book, get_book_full, get_chapter,
-    list_books, list_books_alphabetical,
+    create_book, update_book, delete_book, get_book_owner, claim_book_owner,
+    get_book, get_book_full, get_chapter, get_book_version, get_chapter_range,
+    iter_book_chapters, iter_books,
+    list_books,
     get_books_by_ids, search_books_local,
     import_book_from_external, get_book_by_hash,
-    update_book_chapters
+    update_book_chapters,
+    update_book_fields, add_chapter, update_chapter, delete_chapter, prefetch_chapter
 )
-from app.crud.authors import get_author_by_name, add_book_to_author, get_author_by_user_id
-from app.model.book import Book
+from app.services.chapter_cache import chapter_cache
+from app.services.storage_manager import storage_manager
+from app.services.featured_shelf import featured_shelf
+from app.crud.shelves import get_featured_shelf
+from app.crud.search_index import search_chapters, index_book_chapters, reindex_book, remove_book_from_index
+from app.crud.authors import get_author_by_user_id
+from app.model.book import Book, BookUpdate, Chapter, ChapterUpdate
 from api.auth import get_current_user
 from app.services.annas_archive import AnnasArchiveService, find_books, get_book_metadata
-from app.crud.download_jobs import create_job, get_job
+from app.crud.download_jobs import create_job, get_job, get_active_job_for_hash
 from app.model.download_job import DownloadJob
 
 router = APIRouter(prefix="/books", tags=["Books"])
@@ -19,6 +30,52 @@ router = APIRouter(prefix="/books", tags=["Books"])
 # Shared service instance
 _anna_service = AnnasArchiveService()
 
+# Upper bound on chapters returned by one range request
+MAX_CHAPTER_RANGE = 10
+
+# Cache policies for reading endpoints.
+# Ready chapters practically never change, so browsers may keep them for a day.
+# Book documents carry a download status that moves while processing, so they stay short.
+CHAPTER_CACHE_CONTROL = "public, max-age=86400"
+BOOK_CACHE_CONTROL = "public, max-age=30"
+NO_CACHE = "no-cache"
+
+
+def _make_etag(*parts) -> str:
+    """Strong ETag from the values that identify a revision (ids, updated_at, status...)."""
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+def _not_modified(etag: str, cache_control: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+async def _ndjson(documents):
+    """Serialize an async iterator of documents as newline-delimited JSON, one line per document."""
+    async for doc in documents:
+        yield dumps(doc) + b"\n"
+
+
+async def _prefetch_chapter(book_id: str, chapter_order: int):
+    """Warm the chapter cache so the reader's next page turn is served from memory."""
+    try:
+        await prefetch_chapter(book_id, chapter_order)
+    except Exception:
+        pass  # best effort — a failed prefetch just means a normal read later
+
 
 # ─── Discovery & Search ──────────────────────────────────────────────
 
@@ -26,13 +83,27 @@ _anna_service = AnnasArchiveService()
 async def all_books():
     """List all books — card view (title, author, image only)."""
     result = await list_books()
-    return result
+    # Hot path: serialize the Mongo documents directly, skipping jsonable_encoder
+    return OrjsonResponse(result)
 
 @router.get("/featured")
 async def featured_books():
-    """Featured books sorted A-Z — card view."""
-    result = await list_books_alphabetical()
-    return result
+    """Featured shelf — card view. Precomputed by the featured shelf service, served as one document."""
+    result = await get_featured_shelf()
+    if result is None:
+        # First request before the service has built the shelf
+        result = await featured_shelf.refresh()
+    return OrjsonResponse(result)
+
+@router.get("/export")
+async def export_catalogue():
+    """Stream the whole catalogue (card view) as NDJSON, straight from the database cursor."""
+    return StreamingResponse(_ndjson(iter_books()), media_type="application/x-ndjson")
+
+@router.get("/chapter-cache/stats")
+async def chapter_cache_stats():
+    """Hit ratio and memory use of the in-process hot-chapter cache."""
+    return chapter_cache.stats()
 
 @router.get("/search")
 async def search_books(q: str = "", title: str = ""):
@@ -60,6 +131,18 @@ async def search_books(q: str = "", title: str = ""):
         "external": external_dicts,
     }
 
+@router.get("/search/content")
+async def search_chapter_content(q: str = "", limit: int = Query(default=20, ge=1, le=100)):
+    """
+    Full-text search inside downloaded chapter content.
+    Every hit is a chapter containing all query terms, with the offset
+    of the first match and a short snippet around it.
+    """
+    if not q.strip():
+        return {"results": []}
+    results = await search_chapters(q, limit=limit)
+    return {"results": results}
+
 @router.get("/external-search")
 async def external_search_books(query: str = ""):
     """
@@ -122,6 +205,7 @@ async def import_external_book(md5: str, current_user: dict = Depends(get_curren
 
     # Import into local catalogue
     book_id = await import_book_from_external(details)
+    featured_shelf.mark_stale()
 
     return {"id": book_id, "status": "imported"}
 
@@ -177,6 +261,7 @@ async def one_click_download(md5: str):
         raise HTTPException(status_code=404, detail="Book not found on Anna's Archive")
 
     book_id = await import_book_from_external(details)
+    featured_shelf.mark_stale()
 
     # 3. Create a download job
     job = DownloadJob(book_hash=md5)
@@ -210,85 +295,302 @@ async def get_books_batch_endpoint(ids: list[str] = Query(default=[])):
     """Get multiple books by detailed ID list. Returns card view."""
     if not ids:
         return []
-    return await get_books_by_ids(ids)
+    return OrjsonResponse(await get_books_by_ids(ids))
 
 
 @router.get("/{book_id}")
-async def read_book(book_id: str):
-    """Get book detail — biography + chapter list (titles only, no content)."""
-    book = await get_book(book_id)
+async def read_book(book_id: str, request: Request, response: Response):
+    """Get book detail — biography + chapter list (titles only, no content).
+    Supports If-None-Match; the ETag changes whenever the book is updated or changes status."""
+    try:
+        book = await get_book(book_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not book:
         raise HTTPException(status_code=404, detail="Book Not Found")
+
+    etag = _make_etag(book_id, book.get("updated_at"), book.get("status"))
+    cache_control = BOOK_CACHE_CONTROL if book.get("status") == "ready" else NO_CACHE
+    if _etag_matches(request, etag):
+        return _not_modified(etag, cache_control)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
     return book
 
+@router.get("/{book_id}/export")
+async def export_book(book_id: str):
+    """Stream every chapter of a book as NDJSON, one chapter per line, for offline reading."""
+    try:
+        version = await get_book_version(book_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not version:
+        raise HTTPException(status_code=404, detail="Book Not Found")
+
+    return StreamingResponse(_ndjson(iter_book_chapters(book_id)), media_type="application/x-ndjson")
+
+@router.get("/{book_id}/file")
+async def read_original_file(book_id: str, response: Response):
+    """
+    Serve the original downloaded file (PDF, EPUB, ...) as stored on disk.
+
+    FileResponse answers Range / If-Range requests with 206 partial content, so browsers can
+    stream large PDFs page by page. The file is sent in chunks (or handed to the server via
+    the ASGI pathsend extension, i.e. sendfile, where supported) — never read whole into memory.
+
+    If the original was evicted to save disk, a download job is queued to bring it back
+    and 202 is returned with the job id to poll.
+    """
+    try:
+        book = await get_book(book_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not book:
+        raise HTTPException(status_code=404, detail="Book Not Found")
+
+    file_path = book.get("file_path")
+    if not file_path or not os.path.isfile(file_path):
+        if not book.get("md5"):
+            raise HTTPException(status_code=404, detail="Original file not available")
+        job = await get_active_job_for_hash(book["md5"])
+        job_id = job["_id"] if job else await create_job(DownloadJob(book_hash=book["md5"]))
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"job_id": job_id, "status": "queued"}
+
+    storage_manager.touch(file_path)
+
+    ext = os.path.splitext(file_path)[1]
+    return FileResponse(
+        file_path,
+        filename=f"{book.get('title') or book_id}{ext}",
+        content_disposition_type="inline",
+        headers={"Cache-Control": CHAPTER_CACHE_CONTROL},
+    )
+
+@router.get("/{book_id}/chapters")
+async def read_chapter_range(
+    book_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    start: int = Query(..., ge=0),
+    count: int = Query(default=3, ge=1, le=MAX_CHAPTER_RANGE),
+):
+    """
+    Read several consecutive chapters in one round trip (e.g. the current one plus the next two).
+    The chapter right after the range is prefetched into the server cache.
+    """
+    try:
+        version = await get_book_version(book_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not version:
+        raise HTTPException(status_code=404, detail="Book Not Found")
+
+    etag = _make_etag(book_id, version.get("updated_at"), version.get("status"), start, count)
+    cache_control = CHAPTER_CACHE_CONTROL if version.get("status") == "ready" else NO_CACHE
+    if _etag_matches(request, etag):
+        return _not_modified(etag, cache_control)
+
+    chapters = await get_chapter_range(book_id, start, count)
+    if not chapters:
+        raise HTTPException(status_code=404, detail="Chapter Not Found")
+
+    background_tasks.add_task(_prefetch_chapter, book_id, start + count)
+    return OrjsonResponse(chapters, headers={"ETag": etag, "Cache-Control": cache_control})
+
 @router.get("/{book_id}/chapters/{chapter_order}")
-async def read_chapter(book_id: str, chapter_order: int):
-    """Read a specific chapter's content."""
+async def read_chapter(
+    book_id: str,
+    chapter_order: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+):
+    """Read a specific chapter's content.
+    The ETag is derived from the book's version alone, so a 304 never loads the chapter body."""
+    try:
+        version = await get_book_version(book_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not version:
+        raise HTTPException(status_code=404, detail="Book Not Found")
+
+    etag = _make_etag(book_id, version.get("updated_at"), version.get("status"), chapter_order)
+    cache_control = CHAPTER_CACHE_CONTROL if version.get("status") == "ready" else NO_CACHE
+    if _etag_matches(request, etag):
+        return _not_modified(etag, cache_control)
+
     chapter = await get_chapter(book_id, chapter_order)
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter Not Found")
-    return chapter
+
+    background_tasks.add_task(_prefetch_chapter, book_id, chapter_order + 1)
+    return OrjsonResponse(chapter, headers={"ETag": etag, "Cache-Control": cache_control})
 
 
 # ─── Book CRUD (Author Operations) ───────────────────────────────────
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def add_book(book: Book, current_user: dict = Depends(get_current_user)):
+async def add_book(book: Book, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
     # Only authors can create books
     if "author" not in current_user.get("roles", []):
         raise HTTPException(status_code=403, detail="Only authors can create books")
     
-    # 1. Create the book
+    # 1. Link the book to the caller's author profile by id (stored on the book itself)
+    author = await get_author_by_user_id(current_user["sub"])
+    book.author_id = author["_id"] if author else None
+    book.owner_user_id = current_user["sub"]
+
+    # 2. Create the book
     book_id = await create_book(book)
-    
-    # 2. Try to find the author by name
-    author = await get_author_by_name(book.author)
-    
-    status_msg = "created"
+    featured_shelf.mark_stale()
+    if book.chapters:
+        background_tasks.add_task(index_book_chapters, book_id, [ch.model_dump() for ch in book.chapters])
+
     if author:
-        # 3. Link the book to the author's list
-        await add_book_to_author(author["_id"], book_id)
         status_msg = "created and linked to author"
     else:
         status_msg = "created (author not found in database)"
 
     return {"id": book_id, "status": status_msg}
 
-@router.put("/{book_id}")
-async def modify_book(book_id: str, book: Book, current_user: dict = Depends(get_current_user)):
-    # Only authors can edit books
-    if "author" not in current_user.get("roles", []):
-        raise HTTPException(status_code=403, detail="Only authors can edit books")
-    
-    # Check ownership
-    existing_book = await get_book_full(book_id)
+async def _authorize_unowned_book(book_id: str, current_user: dict, action: str) -> bool:
+    """
+    Called when an owner-conditioned write matched nothing: the book is missing, belongs to
+    someone else, or predates owner_user_id. Legacy books fall back to comparing the author
+    name and, if it matches, get the owner recorded so later writes take the one-call path.
+
+    Returns True if the owner was just recorded (the write is worth retrying), False if the
+    caller already owned the book and the write missed for another reason.
+    """
+    existing_book = await get_book_owner(book_id)
     if not existing_book:
         raise HTTPException(status_code=404, detail="Book Not Found")
-    
+
+    if existing_book.get("owner_user_id") == current_user["sub"]:
+        return False  # caller owns it, the write missed for another reason (e.g. no such chapter)
+
+    forbidden = HTTPException(status_code=403, detail=f"You can only {action} your own books")
+    if existing_book.get("owner_user_id"):
+        raise forbidden
+
     author_profile = await get_author_by_user_id(current_user["sub"])
-    if not author_profile or author_profile["name"] != existing_book["author"]:
-        raise HTTPException(status_code=403, detail="You can only edit your own books")
-    
+    if not author_profile or author_profile["name"] != existing_book.get("author"):
+        raise forbidden
+    await claim_book_owner(book_id, current_user["sub"])
+    return True
+
+async def _update_owned_book(book_id: str, current_user: dict, action: str, write):
+    """Run an owner-conditioned update, falling back to the full ownership check if it matched nothing."""
+    if "author" not in current_user.get("roles", []):
+        raise HTTPException(status_code=403, detail=f"Only authors can {action} books")
     try:
-        await update_book(book_id, book)
-        return {"status": "updated"}
+        result = await write()
+        if result.matched_count == 0 and await _authorize_unowned_book(book_id, current_user, action):
+            result = await write()
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return result
+
+@router.put("/{book_id}")
+async def modify_book(book_id: str, book: Book, current_user: dict = Depends(get_current_user)):
+    # Only authors can edit books; ownership check and write in one round trip
+    await _update_owned_book(
+        book_id, current_user, "edit",
+        lambda: update_book(book_id, book, owner_user_id=current_user["sub"]),
+    )
+    await index_book_chapters(book_id, [ch.model_dump() for ch in book.chapters])
+    featured_shelf.mark_stale()
+    return {"status": "updated"}
+
+@router.patch("/{book_id}")
+async def patch_book(book_id: str, book: BookUpdate, current_user: dict = Depends(get_current_user)):
+    """Update only the fields sent. Chapters are left alone (see the chapter endpoints)."""
+    fields = book.model_dump(exclude_unset=True)
+    if not fields:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    await _update_owned_book(
+        book_id, current_user, "edit",
+        lambda: update_book_fields(book_id, fields, owner_user_id=current_user["sub"]),
+    )
+    featured_shelf.mark_stale()
+    return {"status": "updated", "fields": sorted(fields)}
 
 @router.delete("/{book_id}")
 async def remove_book(book_id: str, current_user: dict = Depends(get_current_user)):
-    # Check ownership
-    existing_book = await get_book_full(book_id)
-    if not existing_book:
-        raise HTTPException(status_code=404, detail="Book Not Found")
-    
-    author_profile = await get_author_by_user_id(current_user["sub"])
-    if not author_profile or author_profile["name"] != existing_book["author"]:
-        raise HTTPException(status_code=403, detail="You can only delete your own books")
-    
-    result = await delete_book(book_id)
+    try:
+        # Ownership check and delete in one round trip
+        result = await delete_book(book_id, owner_user_id=current_user["sub"])
+        if result.deleted_count == 0 and await _authorize_unowned_book(book_id, current_user, "delete"):
+            result = await delete_book(book_id, owner_user_id=current_user["sub"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await remove_book_from_index(book_id)
+    featured_shelf.mark_stale()
     return {"status": "deleted", "result": str(result.deleted_count)}
 
+@router.post("/{book_id}/chapters", status_code=status.HTTP_201_CREATED)
+async def add_book_chapter(
+    book_id: str,
+    chapter: Chapter,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+):
+    """Add one chapter without rewriting the others."""
+    result = await _update_owned_book(
+        book_id, current_user, "edit",
+        lambda: add_chapter(book_id, chapter.model_dump(), owner_user_id=current_user["sub"]),
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail=f"Chapter {chapter.order} already exists")
+    background_tasks.add_task(reindex_book, book_id)
+    featured_shelf.mark_stale()
+    return {"status": "created", "order": chapter.order}
+
+@router.patch("/{book_id}/chapters/{chapter_order}")
+async def modify_book_chapter(
+    book_id: str,
+    chapter_order: int,
+    chapter: ChapterUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+):
+    """Change the title and/or content of one chapter in place."""
+    fields = chapter.model_dump(exclude_unset=True, exclude_none=True)
+    if not fields:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    result = await _update_owned_book(
+        book_id, current_user, "edit",
+        lambda: update_chapter(book_id, chapter_order, fields, owner_user_id=current_user["sub"]),
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Chapter Not Found")
+    if "content" in fields:
+        background_tasks.add_task(reindex_book, book_id)
+    featured_shelf.mark_stale()
+    return {"status": "updated", "order": chapter_order}
+
+@router.delete("/{book_id}/chapters/{chapter_order}")
+async def remove_book_chapter(
+    book_id: str,
+    chapter_order: int,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+):
+    """Remove one chapter."""
+    result = await _update_owned_book(
+        book_id, current_user, "edit",
+        lambda: delete_chapter(book_id, chapter_order, owner_user_id=current_user["sub"]),
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Chapter Not Found")
+    background_tasks.add_task(reindex_book, book_id)
+    featured_shelf.mark_stale()
+    return {"status": "deleted", "order": chapter_order}
+
 
 # ─── Legacy Endpoints ────────────────────────────────────────────────
 
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from app.model.readers import Reader 
+from app.model.readers import Reader, ReadingProgress
 from app.crud.readers import (
     get_reader, 
     list_readers, 
@@ -7,8 +7,12 @@ from app.crud.readers import (
     delete_reader, 
     update_reader,
     add_book_to_reader_list,
-    get_reader_by_user_id
+    get_reader_by_user_id,
+    set_reading_progress,
+    get_reading_progress,
+    READER_LISTS
 )
+from app.crud.books import get_books_by_ids
 from api.auth import get_current_user
 
 router = APIRouter(prefix="/readers", tags=["Readers"])
@@ -22,6 +26,49 @@ async def get_my_reader_profile(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=404, detail="Reader Profile Not Found")
     return reader
 
+@router.get("/me/shelves")
+async def get_my_shelves(current_user: dict = Depends(get_current_user)):
+    """
+    The current user's favorites, in_progress and finished lists, each hydrated with
+    card-view books in the list's own order. All three lists share one $in lookup.
+    """
+    reader = await get_reader_by_user_id(current_user["sub"])
+    if not reader:
+        raise HTTPException(status_code=404, detail="Reader Profile Not Found")
+
+    shelves = {name: reader.get(name) or [] for name in READER_LISTS}
+    # A book can sit on several lists, fetch it once
+    unique_ids = list(dict.fromkeys(book_id for ids in shelves.values() for book_id in ids))
+    books = {book["_id"]: book for book in await get_books_by_ids(unique_ids)}
+
+    result = {"reader_id": reader["_id"]}
+    for name, ids in shelves.items():
+        # Ids whose book was deleted are skipped
+        result[name] = [books[book_id] for book_id in ids if book_id in books]
+    return result
+
+@router.get("/me/progress/{book_id}")
+async def get_my_progress(book_id: str, current_user: dict = Depends(get_current_user)):
+    """Where the current user left off in a book."""
+    try:
+        position = await get_reading_progress(current_user["sub"], book_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if position is None:
+        return {"book_id": book_id, "chapter": None, "offset": 0}
+    return {"book_id": book_id, "chapter": position["c"], "offset": position["o"]}
+
+@router.put("/me/progress/{book_id}")
+async def save_my_progress(book_id: str, progress: ReadingProgress, current_user: dict = Depends(get_current_user)):
+    """Save the current user's position in a book. Cheap enough to call on every page turn."""
+    try:
+        result = await set_reading_progress(current_user["sub"], book_id, progress.chapter, progress.offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Reader Profile Not Found")
+    return {"status": "saved"}
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def make_reader(reader: Reader, current_user: dict = Depends(get_current_user)):
     reader_id = await create_reader(reader)
@@ -56,7 +103,8 @@ async def remove_reader(id: str, current_user: dict = Depends(get_current_user))
 @router.post("/{reader_id}/add-book")
 async def add_book_to_list(reader_id: str, book_id: str, list_name: str, current_user: dict = Depends(get_current_user)):
     """
-    Adds a book to a specific list: 'favorites', 'in_progress', or 'finished'
+    Adds a book to a specific list: 'favorites', 'in_progress', or 'finished'.
+    Adding to in_progress or finished also removes it from the other, in the same update.
     """
     try:
         await add_book_to_reader_list(reader_id, book_id, list_name)
@@ -1,6 +1,11 @@
 
 from dotenv import load_dotenv
 import os
+import time
+import hashlib
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 import jwt
@@ -10,7 +15,11 @@ import jwt
 #CryptContext from passlib knows how to hash and verify passwords.
 # bcrypt is the algorithm, it is slow on purpose for brute force attacks to be difficult.ArithmeticError
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cost factor (log2 of the work). Each +1 doubles the time per hash; pick it with
+# scripts/bench_bcrypt.py. Hashes made at a different cost are upgraded on the next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -20,6 +29,49 @@ def verify_password(plain_password : str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verifies the password and, if the stored hash uses an outdated scheme or cost,
+    also returns a fresh hash to store. The second item is None when no rehash is needed.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# bcrypt takes ~100-300 ms of CPU per call. Async handlers must not call the functions above
+# directly or every in-flight request stalls behind them. Instead they go through a small
+# dedicated thread pool (bcrypt releases the GIL), and once the pool plus a bounded queue is
+# full we refuse new work right away rather than letting a login burst pile up.
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_in_flight = 0
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify calls are already running or queued."""
+
+
+async def _run_hashing(fn, *args):
+    global _hash_in_flight
+    if _hash_in_flight >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        raise PasswordHasherBusy()
+    _hash_in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_in_flight -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await _run_hashing(verify_and_update_password, plain_password, hashed_password)
+
+
 
 #Now that we can hash and verify the password, let's create JWT tokens
 load_dotenv()
@@ -48,16 +100,52 @@ def create_access_token(data : dict) -> str:
     
     return encoded_jwt
 
-def decode_access_token(token : str) -> dict | None:
-    """
-    Takes a JWT string and returns the data inside it.
-    Returns None if the token is invalid or expired.
-    """
-
+def _verify_access_token(token : str) -> dict | None:
+    """Full signature + claim check, no caching."""
     try:
         # jwt.decode() verifies the signature and checks expiration automatically
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except jwt.PyJWTError:
         # This catches expired tokens, tampered tokens, etc.
-        return None
\ No newline at end of file
+        return None
+
+
+# Every authenticated request decodes the same token again and again. Verified payloads are
+# kept for a short while, keyed on the token's SHA-256 (the raw token is never stored).
+# An entry never outlives the token's own "exp", and only valid tokens are cached.
+
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+# sha256(token) -> (payload, cache expiry as a unix timestamp)
+_token_cache: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+
+
+def decode_access_token(token : str) -> dict | None:
+    """
+    Takes a JWT string and returns the data inside it.
+    Returns None if the token is invalid or expired.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+
+    cached = _token_cache.get(key)
+    if cached is not None:
+        payload, expires_at = cached
+        if now < expires_at:
+            _token_cache.move_to_end(key)
+            return dict(payload)
+        del _token_cache[key]
+
+    payload = _verify_access_token(token)
+    if payload is None:
+        return None
+
+    expires_at = now + TOKEN_CACHE_TTL_SECONDS
+    if "exp" in payload:
+        expires_at = min(expires_at, float(payload["exp"]))
+    _token_cache[key] = (payload, expires_at)
+    if len(_token_cache) > TOKEN_CACHE_MAX_ENTRIES:
+        _token_cache.popitem(last=False)
+    return dict(payload)
@@ -1,13 +1,19 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.model.author import Author
 from bson import ObjectId
 
 
 
 database: AsyncIOMotorDatabase = get_db()
+read_database: AsyncIOMotorDatabase = get_read_db()
 #CRUD methods : Create, Read, Update, Delete
 
+async def ensure_indexes():
+    # Book creation and legacy ownership checks resolve the caller's profile by user_id
+    await database["authors"].create_index("user_id")
+
+
 #Implement the Create method
 
 async def create_author(author_data: Author):
@@ -34,7 +40,7 @@ async def get_author(_id: str):
     return None
 
 async def list_authors():
-    collection = database["authors"]
+    collection = read_database["authors"]
     authors = []
     async for author in collection.find():
         author["_id"] = str(author["_id"])
@@ -77,27 +83,6 @@ async def update_author(_id: str, author_data: Author):
 
     return result
 
-async def get_author_by_name(name: str):
-    collection = database["authors"]
-    author = await collection.find_one({"name": name})
-    if author:
-        author["_id"] = str(author["_id"])
-    return author
-
-async def add_book_to_author(author_id: str, book_id: str):
-    try:
-        oid = ObjectId(author_id)
-    except Exception:
-        raise ValueError("Must be a valid id format")
-    
-    collection = database["authors"]
-    # $addToSet ensures we don't add the same book twice
-    result = await collection.update_one(
-        {"_id": oid},
-        {"$addToSet": {"book_list": book_id}}
-    )
-    return result
-
 async def get_author_by_user_id(user_id: str):
     """Find the author profile linked to a specific user account."""
     collection = database["authors"]
@@ -108,7 +93,7 @@ async def get_author_by_user_id(user_id: str):
 
 async def search_authors_by_name(name: str):
     """Search for authors whose name contains the search term (case-insensitive)."""
-    collection = database["authors"]
+    collection = read_database["authors"]
     authors = []
     async for author in collection.find({"name": {"$regex": name, "$options": "i"}}):
         author["_id"] = str(author["_id"])
@@ -1,48 +1,242 @@
+import zlib
+import asyncio
+from datetime import datetime, timedelta, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.model.book import Book
-from bson import ObjectId
+from app.services.chapter_cache import chapter_cache
+from bson import Binary, ObjectId
 
 database: AsyncIOMotorDatabase = get_db()
+read_database: AsyncIOMotorDatabase = get_read_db()
+
+# Books that fail to download are removed by the TTL index on expire_at after this long
+FAILED_BOOK_TTL = timedelta(hours=24)
 
 # Projection that excludes chapters — used for listing/searching (Netflix card view)
 # Only returns: _id, title, author, image
 CARD_PROJECTION = {"chapters": 0, "biography": 0}
 
 # Projection that excludes chapter CONTENT but keeps chapter titles/order (book detail view)
-# Returns everything except the heavy content field inside each chapter
-# MongoDB can't partially project nested arrays with simple projections,
-# so we'll handle this in the get_book function by stripping content in Python
-DETAIL_PROJECTION = None  # we fetch full doc and strip in code
+# Exclusion projections reach into arrays, so only the heavy content field is dropped
+DETAIL_PROJECTION = {"chapters.content": 0, "chapters.encoding": 0}
+
+# Chapter bodies are stored zlib-compressed as BSON binary.
+# Chapters written before compression (plain string content, no "encoding") are still read as-is.
+CHAPTER_ENCODING = "zlib"
+CHAPTER_COMPRESSION_LEVEL = 6
+CHAPTER_COMPRESSION_MIN_BYTES = 256   # below this the zlib header outweighs the savings
+
+
+def encode_chapter(chapter: dict) -> dict:
+    """Return a copy of the chapter ready for storage, with its content compressed."""
+    content = chapter.get("content")
+    if not isinstance(content, str):
+        return chapter
+    raw = content.encode("utf-8")
+    if len(raw) < CHAPTER_COMPRESSION_MIN_BYTES:
+        return chapter
+    encoded = dict(chapter)
+    encoded["content"] = Binary(zlib.compress(raw, CHAPTER_COMPRESSION_LEVEL))
+    encoded["encoding"] = CHAPTER_ENCODING
+    return encoded
+
 
+def decode_chapter(chapter: dict) -> dict:
+    """Inverse of encode_chapter. Plain-text chapters pass through untouched."""
+    if chapter.get("encoding") != CHAPTER_ENCODING:
+        return chapter
+    decoded = dict(chapter)
+    decoded["content"] = zlib.decompress(chapter["content"]).decode("utf-8")
+    del decoded["encoding"]
+    return decoded
+
+
+# Compressing a whole book takes hundreds of ms of CPU, so write paths always call the
+# encoders through asyncio.to_thread and the event loop keeps serving requests meanwhile.
+def _encode_chapters(chapters: list[dict]) -> list[dict]:
+    return [encode_chapter(ch) for ch in chapters]
+
+
+def _encode_book(book: dict) -> dict:
+    if book.get("chapters"):
+        book["chapters"] = _encode_chapters(book["chapters"])
+    return book
+
+
+# Set by the API when a book is created, never taken from an update payload
+SERVER_MANAGED_FIELDS = {"author_id", "owner_user_id"}
+
+async def ensure_indexes():
+    collection = database["books"]
+    await collection.create_index("md5")
+    # /authors/{id}/books pages through an author's books in creation order
+    await collection.create_index([("author_id", 1), ("_id", 1)])
+    # TTL: documents are deleted once expire_at is in the past; only error books carry it
+    await collection.create_index("expire_at", expireAfterSeconds=0)
+
+async def backfill_expire_at() -> int:
+    """Give error books from before the TTL index the usual grace period. One-off: this scans the collection."""
+    result = await database["books"].update_many(
+        {"status": "error", "expire_at": {"$exists": False}},
+        {"$set": {"expire_at": datetime.now(timezone.utc) + FAILED_BOOK_TTL}}
+    )
+    return result.modified_count
 
 async def create_book(book_data: Book):
-    book = book_data.model_dump()
+    book = await asyncio.to_thread(_encode_book, book_data.model_dump())
     collection = database["books"]
     result = await collection.insert_one(book)
     return str(result.inserted_id)
 
-async def update_book(_id: str, book_data: Book):
+def _book_filter(oid: ObjectId, owner_user_id: str | None) -> dict:
+    # With an owner, the write only matches that user's book: ownership check and write in one call
+    query = {"_id": oid}
+    if owner_user_id is not None:
+        query["owner_user_id"] = owner_user_id
+    return query
+
+async def update_book(_id: str, book_data: Book, owner_user_id: str | None = None):
+    """
+    Replace a book's fields. If owner_user_id is given the update only applies when the book
+    belongs to that user; check matched_count to know whether anything was written.
+    """
     try:
         oid = ObjectId(_id)
     except Exception:
         raise ValueError("Must be a valid id format")
 
-    book = book_data.model_dump()
+    # Server-managed links are set once at creation; a client payload must not overwrite them
+    book = await asyncio.to_thread(_encode_book, book_data.model_dump(exclude=SERVER_MANAGED_FIELDS))
+    # updated_at is the version the API derives ETags from, so every write must bump it
+    book["updated_at"] = datetime.now().timestamp()
     collection = database["books"]
-    result = await collection.update_one({"_id": oid}, {"$set": book})
+    result = await collection.update_one(_book_filter(oid, owner_user_id), {"$set": book})
+    if result.matched_count:
+        chapter_cache.invalidate_book(_id)
     return result
 
-async def delete_book(_id: str):
+async def delete_book(_id: str, owner_user_id: str | None = None):
+    """Delete a book; with owner_user_id, only if it belongs to that user (see update_book)."""
     try:
         oid = ObjectId(_id)
     except Exception:
         raise ValueError("Must be a valid id format")
         
     collection = database["books"]
-    result = await collection.delete_one({"_id": oid})
+    result = await collection.delete_one(_book_filter(oid, owner_user_id))
+    if result.deleted_count:
+        chapter_cache.invalidate_book(_id)
     return result
 
+async def update_book_fields(_id: str, fields: dict, owner_user_id: str | None = None):
+    """$set only the given top-level fields (PATCH). Chapters are never touched here."""
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+
+    update = {k: v for k, v in fields.items() if k != "chapters" and k not in SERVER_MANAGED_FIELDS}
+    update["updated_at"] = datetime.now().timestamp()
+    collection = database["books"]
+    result = await collection.update_one(_book_filter(oid, owner_user_id), {"$set": update})
+    if result.matched_count:
+        chapter_cache.invalidate_book(_id)
+    return result
+
+async def add_chapter(_id: str, chapter: dict, owner_user_id: str | None = None):
+    """
+    Append one chapter, keeping the array sorted by order. Matches nothing if the book
+    already has a chapter with that order (or isn't the owner's).
+    """
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+
+    encoded = await asyncio.to_thread(encode_chapter, chapter)
+    query = _book_filter(oid, owner_user_id)
+    query["chapters.order"] = {"$ne": chapter["order"]}
+    collection = database["books"]
+    result = await collection.update_one(query, {
+        "$push": {"chapters": {"$each": [encoded], "$sort": {"order": 1}}},
+        "$set": {"updated_at": datetime.now().timestamp()},
+    })
+    if result.matched_count:
+        chapter_cache.invalidate_book(_id)
+    return result
+
+async def update_chapter(_id: str, order: int, fields: dict, owner_user_id: str | None = None):
+    """Change the title and/or content of a single chapter in place, addressed by its order."""
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+
+    update = {"$set": {"updated_at": datetime.now().timestamp()}}
+    if fields.get("title") is not None:
+        update["$set"]["chapters.$[ch].title"] = fields["title"]
+    if fields.get("content") is not None:
+        encoded = await asyncio.to_thread(encode_chapter, {"content": fields["content"]})
+        update["$set"]["chapters.$[ch].content"] = encoded["content"]
+        if "encoding" in encoded:
+            update["$set"]["chapters.$[ch].encoding"] = encoded["encoding"]
+        else:
+            # Short content is stored as plain text, drop any previous compression marker
+            update["$unset"] = {"chapters.$[ch].encoding": ""}
+
+    query = _book_filter(oid, owner_user_id)
+    query["chapters.order"] = order
+    collection = database["books"]
+    result = await collection.update_one(query, update, array_filters=[{"ch.order": order}])
+    if result.matched_count:
+        chapter_cache.invalidate_book(_id)
+    return result
+
+async def delete_chapter(_id: str, order: int, owner_user_id: str | None = None):
+    """Remove a single chapter by its order."""
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+
+    query = _book_filter(oid, owner_user_id)
+    query["chapters.order"] = order
+    collection = database["books"]
+    result = await collection.update_one(query, {
+        "$pull": {"chapters": {"order": order}},
+        "$set": {"updated_at": datetime.now().timestamp()},
+    })
+    if result.matched_count:
+        chapter_cache.invalidate_book(_id)
+    return result
+
+async def get_book_owner(_id: str):
+    """Only the fields an ownership check needs: owner_user_id and the author name (legacy books)."""
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+
+    collection = database["books"]
+    book = await collection.find_one({"_id": oid}, {"owner_user_id": 1, "author": 1})
+    if book:
+        book["_id"] = str(book["_id"])
+    return book
+
+async def claim_book_owner(_id: str, owner_user_id: str):
+    """Record the owner on a book created before owner_user_id existed. Never overwrites an owner."""
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+
+    collection = database["books"]
+    return await collection.update_one(
+        {"_id": oid, "owner_user_id": None},
+        {"$set": {"owner_user_id": owner_user_id}}
+    )
+
 async def get_book(_id: str):
     """Get a single book with chapter list (titles + order only, no chapter content).
     Used for the book detail page."""
@@ -51,20 +245,15 @@ async def get_book(_id: str):
     except Exception:
         raise ValueError("Must be a valid id format")
 
-    collection = database["books"]
-    book = await collection.find_one({"_id": oid})
+    collection = read_database["books"]
+    # Chapter content is projected out — only title and order remain for the table of contents
+    book = await collection.find_one({"_id": oid}, DETAIL_PROJECTION)
     if book:
         book["_id"] = str(book["_id"])
-        # Strip chapter content — only keep title and order for the table of contents
-        if "chapters" in book:
-            book["chapters"] = [
-                {"title": ch["title"], "order": ch["order"]}
-                for ch in book["chapters"]
-            ]
     return book
 
 async def get_book_full(_id: str):
-    """Get the full book document including all chapter content.
+    """Get the full book document including all chapter content (still compressed).
     Used internally (e.g. for update checks)."""
     try:
         oid = ObjectId(_id)
@@ -77,6 +266,21 @@ async def get_book_full(_id: str):
         book["_id"] = str(book["_id"])
     return book
 
+async def get_book_version(_id: str):
+    """Return only what identifies the current revision of a book: status and updated_at.
+    Lets conditional GETs be answered without touching chapter content."""
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+
+    cached = chapter_cache.get_version(_id)
+    if cached is not None:
+        return cached
+
+    collection = read_database["books"]
+    return await collection.find_one({"_id": oid}, {"_id": 0, "status": 1, "updated_at": 1})
+
 async def get_chapter(_id: str, chapter_order: int):
     """Get a specific chapter from a book by its order number."""
     try:
@@ -84,19 +288,115 @@ async def get_chapter(_id: str, chapter_order: int):
     except Exception:
         raise ValueError("Must be a valid id format")
 
-    collection = database["books"]
-    book = await collection.find_one({"_id": oid})
-    if not book:
+    cached = chapter_cache.get(_id, chapter_order)
+    if cached is not None:
+        return cached
+    return await _load_chapter(oid, _id, chapter_order)
+
+async def prefetch_chapter(_id: str, chapter_order: int):
+    """Warm the cache with a chapter the reader is likely to ask for next.
+    Not a reader request, so it leaves the cache's hit/miss counters alone."""
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+    if not chapter_cache.contains(_id, chapter_order):
+        await _load_chapter(oid, _id, chapter_order)
+
+async def _load_chapter(oid: ObjectId, _id: str, chapter_order: int):
+    """Fetch one chapter from the database and cache it."""
+    collection = read_database["books"]
+    # $elemMatch projection returns only the requested chapter, not the whole book
+    book = await collection.find_one(
+        {"_id": oid},
+        {"_id": 0, "status": 1, "updated_at": 1, "chapters": {"$elemMatch": {"order": chapter_order}}}
+    )
+    if not book or not book.get("chapters"):
         return None
-    
-    for ch in book.get("chapters", []):
-        if ch["order"] == chapter_order:
-            return ch
-    return None
+
+    chapter = decode_chapter(book["chapters"][0])
+    version = {"status": book.get("status"), "updated_at": book.get("updated_at")}
+    chapter_cache.put(_id, chapter_order, chapter, version)
+    return chapter
+
+async def get_chapter_range(_id: str, start: int, count: int):
+    """Get `count` consecutive chapters starting at order `start`, in one query.
+    Served straight from the chapter cache when every chapter in the range is hot."""
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+
+    cached = chapter_cache.get_range(_id, start, count)
+    if cached is not None:
+        return cached
+
+    collection = read_database["books"]
+    pipeline = [
+        {"$match": {"_id": oid}},
+        {"$project": {
+            "_id": 0,
+            "status": 1,
+            "updated_at": 1,
+            # Lets the cache answer later ranges that run past the last chapter
+            "last_order": {"$max": "$chapters.order"},
+            "chapters": {"$filter": {
+                "input": "$chapters",
+                "as": "ch",
+                "cond": {"$and": [
+                    {"$gte": ["$$ch.order", start]},
+                    {"$lt": ["$$ch.order", start + count]},
+                ]},
+            }},
+        }},
+    ]
+    chapters = []
+    async for book in collection.aggregate(pipeline):
+        version = {"status": book.get("status"), "updated_at": book.get("updated_at")}
+        for ch in book.get("chapters") or []:
+            chapter = decode_chapter(ch)
+            chapter_cache.put(_id, chapter["order"], chapter, version, last_order=book.get("last_order"))
+            chapters.append(chapter)
+    chapters.sort(key=lambda ch: ch["order"])
+    return chapters
+
+# Documents pulled per cursor batch when streaming exports
+EXPORT_BATCH_SIZE = 200
+
+async def iter_book_chapters(_id: str):
+    """Yield every chapter of a book in order, decoded, one at a time.
+    Chapters are unwound server-side so the driver never holds more than one batch."""
+    try:
+        oid = ObjectId(_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+
+    collection = read_database["books"]
+    pipeline = [
+        {"$match": {"_id": oid}},
+        {"$unwind": "$chapters"},
+        {"$replaceRoot": {"newRoot": "$chapters"}},
+        {"$sort": {"order": 1}},
+    ]
+    async for chapter in collection.aggregate(pipeline, batchSize=16, allowDiskUse=True):
+        yield decode_chapter(chapter)
+
+async def iter_book_ids_with_chapters():
+    """Yield the id of every ready book that has stored chapters (for index rebuilds)."""
+    collection = database["books"]
+    async for book in collection.find({"status": "ready", "chapters.0": {"$exists": True}}, {"_id": 1}):
+        yield str(book["_id"])
+
+async def iter_books():
+    """Yield the whole catalogue in card view, streamed from the cursor in batches."""
+    collection = read_database["books"]
+    async for book in collection.find({}, CARD_PROJECTION).batch_size(EXPORT_BATCH_SIZE):
+        book["_id"] = str(book["_id"])
+        yield book
 
 async def list_books():
     """List all books — card view only (title, author, image). No chapters or biography."""
-    collection = database["books"]
+    collection = read_database["books"]
     books = []
     async for book in collection.find({}, CARD_PROJECTION):
         book["_id"] = str(book["_id"])
@@ -105,7 +405,7 @@ async def list_books():
 
 async def list_books_alphabetical():
     """Return all books sorted alphabetically — card view only."""
-    collection = database["books"]
+    collection = read_database["books"]
     books = []
     async for book in collection.find({}, CARD_PROJECTION).sort("title", 1):
         book["_id"] = str(book["_id"])
@@ -114,7 +414,7 @@ async def list_books_alphabetical():
 
 async def get_books_by_ids(book_ids: list[str]):
     """Given a list of book ID strings, return card-view book documents."""
-    collection = database["books"]
+    collection = read_database["books"]
     oids = []
     for bid in book_ids:
         try:
@@ -127,32 +427,91 @@ async def get_books_by_ids(book_ids: list[str]):
         books.append(book)
     return books
 
+async def list_books_by_author(author_id: str, legacy_ids: list[str] = (), skip: int = 0, limit: int = 50):
+    """
+    One page of an author's books (card view), oldest first.
+
+    Books carry an indexed author_id. Books created before that field existed are only
+    reachable through the author's legacy book_list, so those ids are OR-ed in.
+    """
+    collection = read_database["books"]
+    query = {"author_id": author_id}
+    legacy_oids = []
+    for bid in legacy_ids:
+        try:
+            legacy_oids.append(ObjectId(bid))
+        except Exception:
+            continue
+    if legacy_oids:
+        query = {"$or": [query, {"_id": {"$in": legacy_oids}}]}
+
+    books = []
+    async for book in collection.find(query, CARD_PROJECTION).sort("_id", 1).skip(skip).limit(limit):
+        book["_id"] = str(book["_id"])
+        books.append(book)
+    return books
+
 async def get_book_by_hash(book_hash: str):
     collection = database["books"]
-    book = await collection.find_one({"md5": book_hash})
+    book = await collection.find_one({"md5": book_hash}, DETAIL_PROJECTION)
     if book:
         book["_id"] = str(book["_id"])
     return book
 
+async def find_existing_hashes(book_hashes: list[str]) -> set[str]:
+    """Return the subset of the given md5 hashes that still have a book document."""
+    collection = database["books"]
+    existing = set()
+    async for book in collection.find({"md5": {"$in": book_hashes}}, {"_id": 0, "md5": 1}):
+        existing.add(book["md5"])
+    return existing
+
 async def update_book_status(book_hash: str, status: str, error: str = ""):
+    update = {"$set": {"status": status, "error_message": error, "updated_at": datetime.now().timestamp()}}
+    if status == "error":
+        update["$set"]["expire_at"] = datetime.now(timezone.utc) + FAILED_BOOK_TTL
+    else:
+        update["$unset"] = {"expire_at": ""}
+
     collection = database["books"]
-    await collection.update_one(
+    book = await collection.find_one_and_update({"md5": book_hash}, update, projection={"_id": 1})
+    if book:
+        chapter_cache.invalidate_book(str(book["_id"]))
+
+async def finalize_book_download(book_hash: str, file_path: str, chapters: list[dict] | None):
+    """
+    Record the end of a successful download in one write: file path, ready status and,
+    when the file could be parsed, the chapters. Returns the book id.
+    """
+    update = {
+        "file_path": file_path,
+        "status": "ready",
+        "error_message": "",
+        "updated_at": datetime.now().timestamp(),
+    }
+    if chapters:
+        update["chapters"] = await asyncio.to_thread(_encode_chapters, chapters)
+
+    collection = database["books"]
+    book = await collection.find_one_and_update(
         {"md5": book_hash},
-        {"$set": {"status": status, "error_message": error}}
+        {"$set": update, "$unset": {"expire_at": ""}},
+        projection={"_id": 1}
     )
+    if not book:
+        return None
+    book_id = str(book["_id"])
+    chapter_cache.invalidate_book(book_id)
+    return book_id
 
-async def delete_failed_books(cutoff_time: float):
+async def set_book_file_path(book_hash: str, file_path: str):
+    """Point a ready book at a re-downloaded original. Nothing else about the book changes."""
     collection = database["books"]
-    result = await collection.delete_many({
-        "status": "error",
-        "updated_at": {"$lt": cutoff_time}
-    })
-    return result.deleted_count
-
+    return await collection.update_one({"md5": book_hash}, {"$set": {"file_path": file_path}})
 
 async def search_books_local(query: str):
     """Search books in the local catalogue by title (case-insensitive partial match)."""
-    collection = database["books"]
+    collection = read_database["books"]
     books = []
     async for book in collection.find(
         {"title": {"$regex": query, "$options": "i"}},
@@ -173,8 +532,6 @@ async def import_book_from_external(anna_book) -> str:
     Returns:
         The string ID of the newly created book document.
     """
-    from datetime import datetime
-
     new_book = Book(
         title=anna_book.title or "Unknown Title",
         author=anna_book.authors or "Unknown Author",
@@ -200,13 +557,18 @@ async def import_book_from_external(anna_book) -> str:
 
 async def update_book_chapters(book_id: str, chapters: list[dict]):
     """Update the chapters field of a book after parsing."""
-    from datetime import datetime
     try:
         oid = ObjectId(book_id)
     except Exception:
         raise ValueError("Must be a valid id format")
+    encoded = await asyncio.to_thread(_encode_chapters, chapters)
     collection = database["books"]
     await collection.update_one(
         {"_id": oid},
-        {"$set": {"chapters": chapters, "status": "ready", "updated_at": datetime.now().timestamp()}}
-    )
\ No newline at end of file
+        {"$set": {
+            "chapters": encoded,
+            "status": "ready",
+            "updated_at": datetime.now().timestamp(),
+        }}
+    )
+    chapter_cache.invalidate_book(book_id)
\ No newline at end of file
@@ -2,11 +2,26 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.db.database import get_db
 from app.model.download_job import DownloadJob, DownloadStatus
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 database: AsyncIOMotorDatabase = get_db()
 COLLECTION = "download_jobs"
 
+# Completed and failed jobs are removed by the TTL index on expire_at after this long
+FINISHED_JOB_TTL = timedelta(hours=24)
+
+async def ensure_indexes():
+    await database[COLLECTION].create_index([("status", 1), ("book_hash", 1)])
+    await database[COLLECTION].create_index("expire_at", expireAfterSeconds=0)
+
+async def backfill_expire_at() -> int:
+    """Give jobs finished before the TTL index the usual grace period. One-off: this scans the collection."""
+    result = await database[COLLECTION].update_many(
+        {"status": {"$in": [DownloadStatus.COMPLETED, DownloadStatus.FAILED]}, "expire_at": {"$exists": False}},
+        {"$set": {"expire_at": datetime.now(timezone.utc) + FINISHED_JOB_TTL}}
+    )
+    return result.modified_count
+
 async def create_job(job_data: DownloadJob):
     job = job_data.model_dump(by_alias=True, exclude={"id"})
     result = await database[COLLECTION].insert_one(job)
@@ -19,15 +34,47 @@ async def get_pending_jobs(limit: int = 5):
         jobs.append(DownloadJob(**job))
     return jobs
 
+async def get_active_job_hashes() -> set[str]:
+    """md5 hashes of books with a job that is queued or downloading."""
+    hashes = await database[COLLECTION].distinct(
+        "book_hash",
+        {"status": {"$in": [DownloadStatus.PENDING, DownloadStatus.DOWNLOADING]}}
+    )
+    return set(hashes)
+
+async def get_active_job_for_hash(book_hash: str):
+    """Return a queued or downloading job for this book, if there is one."""
+    job = await database[COLLECTION].find_one({
+        "book_hash": book_hash,
+        "status": {"$in": [DownloadStatus.PENDING, DownloadStatus.DOWNLOADING]}
+    })
+    if job:
+        job["_id"] = str(job["_id"])
+    return job
+
 async def update_job_status(job_id: str, status: str, progress: int, error: str = ""):
+    fields = {
+        "status": status,
+        "progress": progress,
+        "error_message": error,
+        "updated_at": datetime.now().timestamp()
+    }
+    if status in (DownloadStatus.COMPLETED, DownloadStatus.FAILED):
+        fields["expire_at"] = datetime.now(timezone.utc) + FINISHED_JOB_TTL
+    await database[COLLECTION].update_one({"_id": ObjectId(job_id)}, {"$set": fields})
+
+async def complete_job(job_id: str, file_path: str):
+    """Mark a job completed with its file path in a single write."""
     await database[COLLECTION].update_one(
         {"_id": ObjectId(job_id)},
         {
             "$set": {
-                "status": status,
-                "progress": progress,
-                "error_message": error,
-                "updated_at": datetime.now().timestamp()
+                "status": DownloadStatus.COMPLETED,
+                "progress": 100,
+                "error_message": "",
+                "file_path": file_path,
+                "updated_at": datetime.now().timestamp(),
+                "expire_at": datetime.now(timezone.utc) + FINISHED_JOB_TTL
             }
         }
     )
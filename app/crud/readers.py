@@ -5,6 +5,16 @@ from bson import ObjectId
 
 database : AsyncIOMotorDatabase = get_db()
 
+# The reader's book lists, in the order the dashboard shows them
+READER_LISTS = ("favorites", "in_progress", "finished")
+
+# A book is either being read or finished, never both. Favorites is independent of those.
+READING_STATE_LISTS = ("in_progress", "finished")
+
+async def ensure_indexes():
+    # /readers/me and /readers/me/shelves look the profile up by its owning user
+    await database["readers"].create_index("user_id")
+
 async def create_reader(reader_data: Reader):
     reader = reader_data.model_dump()
     collection = database["readers"]
@@ -53,9 +63,12 @@ async def list_readers():
 
 async def add_book_to_reader_list(reader_id: str, book_id: str, list_name: str):
     """
-    Helper to add a book ID to one of the reader's lists (favorites, in_progress, finished)
+    Helper to add a book ID to one of the reader's lists (favorites, in_progress, finished).
+
+    Moving between in_progress and finished is one atomic update: the book is pulled from
+    the other reading-state list and added to the target in the same write.
     """
-    if list_name not in ["favorites", "in_progress", "finished"]:
+    if list_name not in READER_LISTS:
         raise ValueError("Invalid list name")
         
     try:
@@ -65,13 +78,42 @@ async def add_book_to_reader_list(reader_id: str, book_id: str, list_name: str):
         
     collection = database["readers"]
     # $addToSet ensures no duplicates
-    # $pull from other lists if needed? For now just add.
+    update = {"$addToSet": {list_name: book_id}}
+    others = [name for name in READING_STATE_LISTS if name != list_name]
+    if list_name in READING_STATE_LISTS and others:
+        update["$pull"] = {name: book_id for name in others}
+    result = await collection.update_one({"_id": oid}, update)
+    return result
+
+async def set_reading_progress(user_id: str, book_id: str, chapter: int, offset: int):
+    """
+    Store where the user is in a book. Positions live in a per-reader map
+    progress.<book_id> = {"c": chapter order, "o": offset}, so a save is one small $set.
+    """
+    try:
+        # Also guarantees the key is safe to use in a dotted field path
+        ObjectId(book_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+    collection = database["readers"]
     result = await collection.update_one(
-        {"_id": oid},
-        {"$addToSet": {list_name: book_id}}
+        {"user_id": user_id},
+        {"$set": {f"progress.{book_id}": {"c": chapter, "o": offset}}}
     )
     return result
 
+async def get_reading_progress(user_id: str, book_id: str):
+    """Return {"c": chapter, "o": offset} for the book, or None if the user hasn't started it."""
+    try:
+        ObjectId(book_id)
+    except Exception:
+        raise ValueError("Must be a valid id format")
+    collection = database["readers"]
+    reader = await collection.find_one({"user_id": user_id}, {"_id": 0, f"progress.{book_id}": 1})
+    if reader is None:
+        return None
+    return reader.get("progress", {}).get(book_id)
+
 async def get_reader_by_user_id(user_id: str):
     """Find the reader profile linked to a specific user account."""
     collection = database["readers"]
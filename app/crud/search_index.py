@@ -0,0 +1,321 @@
+import asyncio
+import re
+from collections import defaultdict
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+from app.db.database import get_db, get_read_db
+from app.crud.books import decode_chapter, get_book_full
+from bson import Binary, ObjectId
+
+database: AsyncIOMotorDatabase = get_db()
+read_database: AsyncIOMotorDatabase = get_read_db()
+COLLECTION = "chapter_index"
+
+# Inverted index over chapter text.
+# One document per (term, book): {"term", "book_id", "tf", "postings"}
+# `postings` is a packed varint stream, one record per chapter containing the term:
+#   chapter_order_delta, term_frequency, n_offsets, offset_delta_1 ... offset_delta_n
+# Chapter orders and offsets are delta-encoded so most values fit in a single byte.
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 40
+MAX_OFFSETS_PER_CHAPTER = 16   # enough for snippets; tf still counts every hit
+WRITE_BATCH_SIZE = 1000
+SNIPPET_RADIUS = 80
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from",
+    "had", "has", "have", "he", "her", "his", "i", "in", "is", "it", "its",
+    "me", "my", "not", "of", "on", "or", "she", "so", "that", "the", "their",
+    "them", "there", "they", "this", "to", "was", "we", "were", "which",
+    "with", "you", "your",
+})
+
+
+def tokenize(text: str):
+    """Yield (term, offset) pairs for every indexable word in the text."""
+    for match in _TOKEN_RE.finditer(text):
+        term = match.group().lower()
+        if len(term) < MIN_TOKEN_LENGTH or len(term) > MAX_TOKEN_LENGTH:
+            continue
+        if term in STOPWORDS:
+            continue
+        yield term, match.start()
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varints(data: bytes):
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = 0
+            shift = 0
+
+
+def encode_postings(postings: dict[int, tuple[int, list[int]]]) -> bytes:
+    """Pack {chapter_order: (tf, offsets)} into the compact varint format."""
+    out = bytearray()
+    prev_order = 0
+    for order in sorted(postings):
+        tf, offsets = postings[order]
+        _write_varint(out, order - prev_order)
+        _write_varint(out, tf)
+        _write_varint(out, len(offsets))
+        prev_offset = 0
+        for offset in offsets:
+            _write_varint(out, offset - prev_offset)
+            prev_offset = offset
+        prev_order = order
+    return bytes(out)
+
+
+def decode_postings(data: bytes) -> dict[int, tuple[int, list[int]]]:
+    """Inverse of encode_postings."""
+    postings = {}
+    values = _read_varints(data)
+    order = 0
+    for order_delta in values:
+        order += order_delta
+        tf = next(values)
+        n_offsets = next(values)
+        offsets = []
+        offset = 0
+        for _ in range(n_offsets):
+            offset += next(values)
+            offsets.append(offset)
+        postings[order] = (tf, offsets)
+    return postings
+
+
+def _build_book_postings(chapters: list[dict]) -> dict[str, dict[int, tuple[int, list[int]]]]:
+    """term -> {chapter_order: (tf, first offsets)} for a whole book."""
+    tf_by_term = defaultdict(lambda: defaultdict(int))
+    offsets_by_term = defaultdict(lambda: defaultdict(list))
+    for ch in chapters:
+        content = ch.get("content")
+        if not isinstance(content, str) or not content:
+            continue
+        order = ch["order"]
+        for term, offset in tokenize(content):
+            tf_by_term[term][order] += 1
+            offsets = offsets_by_term[term][order]
+            if len(offsets) < MAX_OFFSETS_PER_CHAPTER:
+                offsets.append(offset)
+
+    return {
+        term: {order: (tf, offsets_by_term[term][order]) for order, tf in per_chapter.items()}
+        for term, per_chapter in tf_by_term.items()
+    }
+
+
+async def ensure_indexes():
+    collection = database[COLLECTION]
+    await collection.create_index([("term", 1), ("book_id", 1)], unique=True)
+    await collection.create_index("book_id")
+
+
+# Re-indexes of the same book in this process run one at a time.
+# book_id -> (lock, number of callers holding or waiting on it)
+_book_locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+
+async def index_book_chapters(book_id: str, chapters: list[dict]):
+    """
+    (Re)build the index entries for one book. Replaces anything previously indexed for it.
+
+    Entries are upserted per term and only terms the book no longer contains are deleted
+    afterwards, so a concurrent re-index never hits the unique (term, book_id) index and the
+    book never drops out of search while it is being rebuilt. The switch is not atomic:
+    until the last batch lands, a query may combine new postings for one term with old
+    postings for another, and stale terms keep matching until the final delete.
+    """
+    # Tokenizing a full book is CPU-bound, keep it off the event loop
+    book_postings = await asyncio.to_thread(_build_book_postings, chapters)
+
+    lock, users = _book_locks.get(book_id, (asyncio.Lock(), 0))
+    _book_locks[book_id] = (lock, users + 1)
+    try:
+        async with lock:
+            collection = database[COLLECTION]
+            batch = []
+            for term, postings in book_postings.items():
+                doc = {
+                    "term": term,
+                    "book_id": book_id,
+                    "tf": sum(tf for tf, _ in postings.values()),
+                    "postings": Binary(encode_postings(postings)),
+                }
+                batch.append(ReplaceOne({"term": term, "book_id": book_id}, doc, upsert=True))
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    await collection.bulk_write(batch, ordered=False)
+                    batch = []
+            if batch:
+                await collection.bulk_write(batch, ordered=False)
+
+            await collection.delete_many({"book_id": book_id, "term": {"$nin": list(book_postings)}})
+    finally:
+        lock, users = _book_locks[book_id]
+        if users == 1:
+            del _book_locks[book_id]
+        else:
+            _book_locks[book_id] = (lock, users - 1)
+    return len(book_postings)
+
+
+async def reindex_book(book_id: str):
+    """Rebuild one book's entries from the chapters currently stored (read from the primary)."""
+    try:
+        book = await get_book_full(book_id)
+    except ValueError:
+        return 0
+    if not book:
+        return 0
+    chapters = await asyncio.to_thread(lambda: [decode_chapter(ch) for ch in book.get("chapters") or []])
+    return await index_book_chapters(book_id, chapters)
+
+
+async def remove_book_from_index(book_id: str):
+    result = await database[COLLECTION].delete_many({"book_id": book_id})
+    return result.deleted_count
+
+
+async def _term_document_counts(terms: list[str]) -> dict[str, int]:
+    counts = {term: 0 for term in terms}
+    pipeline = [
+        {"$match": {"term": {"$in": terms}}},
+        {"$group": {"_id": "$term", "count": {"$sum": 1}}},
+    ]
+    async for row in read_database[COLLECTION].aggregate(pipeline):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+
+def _make_snippet(content: str, offset: int) -> str:
+    start = max(0, offset - SNIPPET_RADIUS)
+    end = min(len(content), offset + SNIPPET_RADIUS)
+    # Don't cut words in half at either edge
+    if start > 0:
+        space = content.find(" ", start, offset)
+        if space != -1:
+            start = space + 1
+    if end < len(content):
+        space = content.rfind(" ", offset, end)
+        if space != -1:
+            end = space
+    snippet = " ".join(content[start:end].split())
+    if start > 0:
+        snippet = "…" + snippet
+    if end < len(content):
+        snippet = snippet + "…"
+    return snippet
+
+
+async def _fetch_snippet_sources(hits: list[dict]) -> dict[tuple[str, int], dict]:
+    """Fetch only the matched chapters (plus book titles) for a page of hits, in one round trip."""
+    keys = [f"{hit['book_id']}:{hit['chapter_order']}" for hit in hits]
+    oids = []
+    for book_id in {hit["book_id"] for hit in hits}:
+        try:
+            oids.append(ObjectId(book_id))
+        except Exception:
+            continue
+
+    pipeline = [
+        {"$match": {"_id": {"$in": oids}}},
+        {"$project": {
+            "title": 1,
+            "chapters": {"$filter": {
+                "input": "$chapters",
+                "as": "ch",
+                "cond": {"$in": [
+                    {"$concat": [{"$toString": "$_id"}, ":", {"$toString": "$$ch.order"}]},
+                    keys,
+                ]},
+            }},
+        }},
+    ]
+    sources = {}
+    async for book in read_database["books"].aggregate(pipeline):
+        book_id = str(book["_id"])
+        for ch in book.get("chapters") or []:
+            sources[(book_id, ch["order"])] = {"book_title": book.get("title"), **decode_chapter(ch)}
+    return sources
+
+
+async def search_chapters(query: str, limit: int = 20):
+    """
+    Find chapters containing every term of the query.
+    Returns hits ordered by relevance with book id, chapter order, offset and a snippet.
+    """
+    terms = list(dict.fromkeys(term for term, _ in tokenize(query)))
+    if not terms:
+        return []
+
+    collection = read_database[COLLECTION]
+
+    # Walk terms from rarest to most common so the candidate set shrinks as fast as possible
+    counts = await _term_document_counts(terms)
+    if any(count == 0 for count in counts.values()):
+        return []
+    terms.sort(key=lambda t: counts[t])
+
+    # book_id -> chapter_order -> (score, first offset of the rarest term)
+    candidates: dict[str, dict[int, tuple[float, int]]] = {}
+    for i, term in enumerate(terms):
+        term_filter = {"term": term}
+        if i > 0:
+            term_filter["book_id"] = {"$in": list(candidates)}
+        idf = 1.0 / counts[term]
+
+        matched = {}
+        async for doc in collection.find(term_filter, {"book_id": 1, "postings": 1}):
+            postings = decode_postings(doc["postings"])
+            previous = candidates.get(doc["book_id"])
+            chapters = {}
+            for order, (tf, offsets) in postings.items():
+                if previous is None:
+                    chapters[order] = (tf * idf, offsets[0] if offsets else 0)
+                elif order in previous:
+                    score, offset = previous[order]
+                    chapters[order] = (score + tf * idf, offset)
+            if chapters:
+                matched[doc["book_id"]] = chapters
+
+        candidates = matched
+        if not candidates:
+            return []
+
+    hits = [
+        {"book_id": book_id, "chapter_order": order, "offset": offset, "score": score}
+        for book_id, chapters in candidates.items()
+        for order, (score, offset) in chapters.items()
+    ]
+    hits.sort(key=lambda h: h["score"], reverse=True)
+    hits = hits[:limit]
+
+    sources = await _fetch_snippet_sources(hits)
+    results = []
+    for hit in hits:
+        source = sources.get((hit["book_id"], hit["chapter_order"]))
+        if not source:
+            continue  # book or chapter was removed after indexing
+        content = source.get("content") or ""
+        results.append({
+            **hit,
+            "book_title": source.get("book_title"),
+            "chapter_title": source.get("title"),
+            "snippet": _make_snippet(content, hit["offset"]) if isinstance(content, str) else "",
+        })
+    return results
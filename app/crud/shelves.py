@@ -0,0 +1,93 @@
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.db.database import get_db, get_read_db
+from app.crud.books import CARD_PROJECTION
+from bson import ObjectId
+
+database: AsyncIOMotorDatabase = get_db()
+read_database: AsyncIOMotorDatabase = get_read_db()
+COLLECTION = "shelves"
+FEATURED_ID = "featured"
+
+# Selection rules for the featured shelf
+RULE_RECENT = "recent"              # newest additions first
+RULE_POPULAR = "popular"            # most often on readers' lists
+RULE_ALPHABETICAL = "alphabetical"  # random sample of the catalogue, sorted A–Z
+FEATURED_RULES = {RULE_RECENT, RULE_POPULAR, RULE_ALPHABETICAL}
+
+
+async def _select_recent(limit: int, exclude: list = None):
+    query = {"_id": {"$nin": exclude}} if exclude else {}
+    # ObjectIds start with their creation time, so _id order is insertion order (and indexed)
+    cursor = read_database["books"].find(query, CARD_PROJECTION).sort("_id", -1).limit(limit)
+    return [book async for book in cursor]
+
+
+async def _select_popular(limit: int):
+    # Count how many readers have each book on any of their lists
+    pipeline = [
+        {"$project": {"books": {"$setUnion": [
+            {"$ifNull": ["$favorites", []]},
+            {"$ifNull": ["$in_progress", []]},
+            {"$ifNull": ["$finished", []]},
+        ]}}},
+        {"$unwind": "$books"},
+        {"$group": {"_id": "$books", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+    ranked = []
+    async for row in read_database["readers"].aggregate(pipeline):
+        try:
+            ranked.append(ObjectId(row["_id"]))
+        except Exception:
+            continue
+
+    books_by_id = {}
+    async for book in read_database["books"].find({"_id": {"$in": ranked}}, CARD_PROJECTION):
+        books_by_id[book["_id"]] = book
+    books = [books_by_id[oid] for oid in ranked if oid in books_by_id]
+
+    # Not enough reading activity yet — fill up with the newest books
+    if len(books) < limit:
+        books += await _select_recent(limit - len(books), exclude=[b["_id"] for b in books])
+    return books
+
+
+async def _select_alphabetical(limit: int):
+    pipeline = [
+        {"$sample": {"size": limit}},
+        {"$project": CARD_PROJECTION},
+        {"$sort": {"title": 1}},
+    ]
+    return [book async for book in read_database["books"].aggregate(pipeline)]
+
+
+async def refresh_featured_shelf(rule: str, limit: int):
+    """Recompute the featured shelf and store it as a single small document."""
+    if rule == RULE_RECENT:
+        books = await _select_recent(limit)
+    elif rule == RULE_POPULAR:
+        books = await _select_popular(limit)
+    elif rule == RULE_ALPHABETICAL:
+        books = await _select_alphabetical(limit)
+    else:
+        raise ValueError(f"Unknown featured shelf rule: {rule}")
+
+    for book in books:
+        book["_id"] = str(book["_id"])
+
+    await database[COLLECTION].replace_one(
+        {"_id": FEATURED_ID},
+        {"rule": rule, "books": books, "refreshed_at": datetime.now().timestamp()},
+        upsert=True
+    )
+    return books
+
+
+async def get_featured_shelf():
+    """Return the precomputed featured books, or None if the shelf was never built."""
+    shelf = await read_database[COLLECTION].find_one({"_id": FEATURED_ID})
+    if not shelf:
+        return None
+    return shelf["books"]
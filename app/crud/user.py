@@ -1,13 +1,50 @@
+import logging
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError, OperationFailure
 from app.db.database import get_db
 from app.model.user import UserInDB
 
+logger = logging.getLogger(__name__)
+
 database: AsyncIOMotorDatabase = get_db()
 
+# Set once the unique index on username is known to exist. Until then create_user
+# falls back to checking for the username itself, so duplicates are never let through.
+username_index_ready = False
+
+async def ensure_indexes():
+    global username_index_ready
+    # Usernames are unique: registration relies on this index instead of a separate lookup
+    try:
+        await database["users"].create_index("username", unique=True)
+        username_index_ready = True
+    except OperationFailure as e:
+        # Duplicates left over from the old check-then-insert registration block the index.
+        # Don't take the API down over it: report them so they can be merged by hand.
+        duplicates = await find_duplicate_usernames()
+        logger.error(
+            f"Could not create unique index on users.username ({e}). "
+            f"Registration falls back to a username lookup. Duplicate usernames: {duplicates or 'none found'}"
+        )
+
+async def find_duplicate_usernames(limit: int = 100) -> list[str]:
+    """Usernames held by more than one user document."""
+    pipeline = [
+        {"$group": {"_id": "$username", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    return [doc["_id"] async for doc in database["users"].aggregate(pipeline)]
+
 async def create_user(user_data: UserInDB):
-    """Insert a new user document into the 'users' collection."""
+    """
+    Insert a new user document into the 'users' collection.
+    Raises pymongo's DuplicateKeyError if the username is already taken.
+    """
     user = user_data.model_dump()
     collection = database["users"]
+    if not username_index_ready and await collection.find_one({"username": user_data.username}, {"_id": 1}):
+        raise DuplicateKeyError(f"Username already taken: {user_data.username}")
     result = await collection.insert_one(user)
     return str(result.inserted_id)
 
@@ -18,3 +55,8 @@ async def find_user_by_username(username: str):
     if user:
         user["_id"] = str(user["_id"])
     return user
+
+async def update_user_password_hash(username: str, hashed_password: str):
+    """Replace a user's stored password hash (used to upgrade hashes at login)."""
+    collection = database["users"]
+    await collection.update_one({"username": username}, {"$set": {"hashed_password": hashed_password}})
@@ -1,16 +1,105 @@
+import os
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import SecondaryPreferred
 
-#The Address
-MONGO_URL = "mongodb://db:27017"
+#The Address — docker-compose sets MONGO_URL, the default matches its service name
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://db:27017")
 
-#The Client
-client = AsyncIOMotorClient(MONGO_URL)
+#If book_db doesn't exist yet, MongoDB creates it automatically on first write
+DATABASE_NAME = os.getenv("MONGO_DB_NAME", "book_db")
 
-#Creating the book database
-#If book_db doesn't exist yet, it creates it automatically bc MongoDB operates intelligently
-database = client.book_db
 
+# Catalogue reads that tolerate slightly stale data may be served by secondaries.
+# The driver won't pick a secondary lagging more than this (MongoDB requires >= 90s).
+READ_MAX_STALENESS_SECONDS = max(90, int(os.getenv("MONGO_READ_MAX_STALENESS_SECONDS", "90")))
 
-#Repositories will run this function 
+
+def client_options() -> dict:
+    """Connection pool and driver settings, all tunable from the environment."""
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "10")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+        "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+    }
+    # e.g. "zstd,snappy,zlib" — the driver skips any compressor whose module isn't installed
+    compressors = os.getenv("MONGO_COMPRESSORS", "zlib")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+#The Client — created by connect_db() in the FastAPI lifespan, closed by close_db()
+_client: AsyncIOMotorClient | None = None
+_closed = False
+
+
+def connect_db() -> AsyncIOMotorClient:
+    global _client, _closed
+    if _client is None:
+        _client = AsyncIOMotorClient(MONGO_URL, **client_options())
+    _closed = False
+    return _client
+
+
+def close_db():
+    global _client, _closed
+    if _client is not None:
+        _client.close()
+        _client = None
+    _closed = True
+
+
+def get_client() -> AsyncIOMotorClient:
+    if _client is not None:
+        return _client
+    # After shutdown, a straggling task must fail rather than quietly open a new pool
+    if _closed:
+        raise RuntimeError("Database client has been closed")
+    # Scripts that use the CRUD layer without the app get a client on first use
+    return connect_db()
+
+
+async def ping_db() -> bool:
+    """Readiness check: round trip to the server (also opens the first pooled connection)."""
+    await get_client().admin.command("ping")
+    return True
+
+
+class _Database:
+    """
+    Stand-in for the book_db handle.
+
+    CRUD modules grab `database` at import time, before the lifespan has created the client,
+    so every lookup is forwarded to whichever client is current.
+    """
+
+    def __init__(self, read_preference=None):
+        self._read_preference = read_preference
+
+    def _db(self):
+        return get_client().get_database(DATABASE_NAME, read_preference=self._read_preference)
+
+    def __getitem__(self, name: str):
+        return self._db()[name]
+
+    def __getattr__(self, name: str):
+        return getattr(self._db(), name)
+
+
+database = _Database()
+read_database = _Database(SecondaryPreferred(max_staleness=READ_MAX_STALENESS_SECONDS))
+
+
+#Repositories will run this function
 def get_db():
-    return database
\ No newline at end of file
+    return database
+
+
+#Catalogue reads safe to serve from a secondary use this handle.
+#Writes, and reads that must see the caller's own writes, stay on get_db()
+def get_read_db():
+    return read_database
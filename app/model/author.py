@@ -4,6 +4,6 @@ from typing import Optional
 class Author(BaseModel):
     name: str
     biography: Optional[str] = None
-    book_list: list[str] = []
+    book_list: list[str] = []              # legacy: new books point here through books.author_id
     profile_picture: Optional[str] = None   # URL to profile picture
     user_id: Optional[str] = None           # links to the User who owns this profile
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime
 
@@ -33,6 +33,34 @@ class Book(BaseModel):
     error_message: Optional[str] = None
     file_path: Optional[str] = None
     requested_by: Optional[str] = None
+    author_id: Optional[str] = None    # Author profile that wrote it, set by the API on creation
+    owner_user_id: Optional[str] = None  # Username allowed to edit/delete it, set by the API on creation
     
-    created_at: float = datetime.now().timestamp()
-    updated_at: float = datetime.now().timestamp()
+    created_at: float = Field(default_factory=lambda: datetime.now().timestamp())
+    updated_at: float = Field(default_factory=lambda: datetime.now().timestamp())
+
+
+class BookUpdate(BaseModel):
+    """PATCH body: only the fields sent are written. Chapters have their own endpoints."""
+    title: Optional[str] = None
+    author: Optional[str] = None
+    biography: Optional[str] = None
+    description: Optional[str] = None
+    image: Optional[str] = None
+    cover_url: Optional[str] = None
+    language: Optional[str] = None
+    publisher: Optional[str] = None
+    year: Optional[str] = None
+    isbn: Optional[str] = None
+
+    @field_validator("title", "author")
+    @classmethod
+    def required_fields_not_null(cls, value):
+        # Omit them to leave them unchanged; null would blank a field every book must have
+        if value is None:
+            raise ValueError("cannot be null")
+        return value
+
+class ChapterUpdate(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 class Reader(BaseModel):
@@ -7,3 +7,8 @@ class Reader(BaseModel):
     in_progress: list[str] = []
     finished: list[str] = []
     user_id: Optional[str] = None    # links to the User who owns this profile
+    progress: dict[str, dict] = {}   # book_id -> {"c": chapter order, "o": offset in chapter}
+
+class ReadingProgress(BaseModel):
+    chapter: int = Field(ge=0)
+    offset: int = Field(default=0, ge=0)
@@ -0,0 +1,29 @@
+from typing import Any
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+
+def _default(obj: Any):
+    # Types orjson doesn't know that can come straight out of a Mongo document.
+    # Bytes (e.g. bson.Binary chapter content) are deliberately not handled: a leak should raise.
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes with orjson (datetimes, ObjectIds and non-str keys included)."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class OrjsonResponse(JSONResponse):
+    """
+    JSON response rendered with orjson instead of json.dumps.
+
+    Set as the app's default response class. Hot endpoints return it directly with raw
+    Mongo documents, which also skips FastAPI's jsonable_encoder walk over every nested field.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
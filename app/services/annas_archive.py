@@ -4,10 +4,10 @@ import urllib.parse
 import re
 import os
 import json
-from pathvalidate import sanitize_filename
 import logging
 from typing import Optional
 from dataclasses import dataclass, field, asdict
+from app.services.file_store import FileStore
 
 logger = logging.getLogger(__name__)
 
@@ -68,13 +68,13 @@ class Book:
         """Convert Book to dictionary."""
         return asdict(self)
 
-    async def download(self, secret_key: str, folder_path: str) -> str:
+    async def download(self, secret_key: str, store: FileStore) -> str:
         """
         Download the book file using the Anna's Archive fast download API.
         
         Args:
             secret_key: API key for fast download
-            folder_path: Directory to save the downloaded file
+            store: Content-addressed file store the file is written into (keyed by md5)
             
         Returns:
             Path to the downloaded file
@@ -92,20 +92,13 @@ class Book:
                 err_msg = data.get("error", "Failed to get download URL")
                 raise Exception(err_msg)
 
-            download_resp = await client.get(download_url, follow_redirects=True, timeout=300.0)
-            if download_resp.status_code != 200:
-                raise Exception(f"Failed to download file: HTTP {download_resp.status_code}")
+            # Stream to disk instead of buffering the whole file in memory
+            async with client.stream("GET", download_url, follow_redirects=True, timeout=300.0) as download_resp:
+                if download_resp.status_code != 200:
+                    raise Exception(f"Failed to download file: HTTP {download_resp.status_code}")
 
-            # Create safe filename
-            safe_title = sanitize_filename(self.title) if self.title else self.hash
-            ext = self.format.lower() if self.format else "bin"
-            filename = f"{safe_title}.{ext}"
-            file_path = os.path.join(folder_path, filename)
-
-            with open(file_path, "wb") as f:
-                f.write(download_resp.content)
-            
-            return file_path
+                ext = self.format.lower() if self.format else "bin"
+                return await store.write_stream(self.hash, ext, download_resp.aiter_bytes())
 
 
 def _extract_meta_information(meta: str) -> tuple[str, str, str]:
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+from collections import OrderedDict
+from app.db.database import READ_MAX_STALENESS_SECONDS
+
+# Fixed per-entry overhead on top of the strings themselves (dict, key tuple, LRU links)
+ENTRY_OVERHEAD_BYTES = 512
+
+
+def _chapter_size(chapter: dict) -> int:
+    size = ENTRY_OVERHEAD_BYTES
+    for value in chapter.values():
+        size += sys.getsizeof(value)
+    return size
+
+
+class ChapterCache:
+    """
+    In-process LRU of decoded chapter payloads, bounded by total bytes rather than entry count.
+
+    Alongside the chapters it keeps each cached book's version (status + updated_at) so
+    conditional GETs on hot books can be answered without a database round trip.
+    Entries bigger than the whole budget are never cached.
+
+    It also remembers each cached book's last chapter order, so a range request running past
+    the end of the book can still be answered from memory.
+
+    Chapters may be read from a lagging secondary, so for `stale_window_seconds` after a book
+    is invalidated nothing is cached for it — otherwise a stale read could stay cached forever.
+    """
+
+    def __init__(self, max_bytes: int, stale_window_seconds: float = 0):
+        self.max_bytes = max_bytes
+        self.stale_window_seconds = stale_window_seconds
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple[str, int], tuple[dict, int]] = OrderedDict()
+        self._orders_by_book: dict[str, set[int]] = {}
+        self._versions: dict[str, dict] = {}
+        self._last_orders: dict[str, int] = {}
+        self._invalidated_at: dict[str, float] = {}
+
+    def get(self, book_id: str, order: int) -> dict | None:
+        entry = self._entries.get((book_id, order))
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end((book_id, order))
+        self.hits += 1
+        return entry[0]
+
+    def contains(self, book_id: str, order: int) -> bool:
+        """Membership check for prefetching: doesn't count as a hit or miss, doesn't touch LRU order."""
+        return (book_id, order) in self._entries
+
+    def get_range(self, book_id: str, start: int, count: int) -> list[dict] | None:
+        """
+        Chapters start .. start+count-1 if all of them are cached, else None.
+        Counts as a single hit or miss, however many chapters the range spans.
+        """
+        end = start + count
+        last_order = self._last_orders.get(book_id)
+        if last_order is not None:
+            end = min(end, last_order + 1)
+
+        keys = [(book_id, order) for order in range(start, end)]
+        entries = [self._entries.get(key) for key in keys]
+        if any(entry is None for entry in entries):
+            self.misses += 1
+            return None
+        for key in keys:
+            self._entries.move_to_end(key)
+        self.hits += 1
+        return [chapter for chapter, _ in entries]
+
+    def get_version(self, book_id: str) -> dict | None:
+        return self._versions.get(book_id)
+
+    def put(self, book_id: str, order: int, chapter: dict, version: dict | None = None, last_order: int | None = None):
+        size = _chapter_size(chapter)
+        if size > self.max_bytes:
+            return
+        invalidated_at = self._invalidated_at.get(book_id)
+        if invalidated_at is not None and time.monotonic() - invalidated_at < self.stale_window_seconds:
+            return
+
+        key = (book_id, order)
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (chapter, size)
+        self._orders_by_book.setdefault(book_id, set()).add(order)
+        self.current_bytes += size
+        if version is not None:
+            self._versions[book_id] = version
+        if last_order is not None:
+            self._last_orders[book_id] = last_order
+
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_book(self, book_id: str):
+        for order in list(self._orders_by_book.get(book_id, ())):
+            self._remove((book_id, order))
+        self._versions.pop(book_id, None)
+        self._last_orders.pop(book_id, None)
+
+        if self.stale_window_seconds > 0:
+            now = time.monotonic()
+            # Forget invalidations that are past the window so this map stays small
+            expired = [bid for bid, ts in self._invalidated_at.items() if now - ts >= self.stale_window_seconds]
+            for bid in expired:
+                del self._invalidated_at[bid]
+            self._invalidated_at[book_id] = now
+
+    def clear(self):
+        self._entries.clear()
+        self._invalidated_at.clear()
+        self._orders_by_book.clear()
+        self._versions.clear()
+        self._last_orders.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key: tuple[str, int]):
+        _, size = self._entries.pop(key)
+        self.current_bytes -= size
+        book_id, order = key
+        orders = self._orders_by_book.get(book_id)
+        if orders is not None:
+            orders.discard(order)
+            if not orders:
+                del self._orders_by_book[book_id]
+                # Version and last order are only kept while the book has something cached
+                self._versions.pop(book_id, None)
+                self._last_orders.pop(book_id, None)
+
+
+# Shared instance used by the books CRUD layer
+chapter_cache = ChapterCache(
+    int(os.getenv("CHAPTER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    stale_window_seconds=READ_MAX_STALENESS_SECONDS,
+)
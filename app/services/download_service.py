@@ -1,32 +1,103 @@
 import asyncio
 import os
+import time
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from app.crud import download_jobs as job_crud
 from app.crud import books as book_crud
+from app.crud import search_index
 from app.model.download_job import DownloadJob, DownloadStatus, BookStatus
 from app.services import annas_archive as anna
+from app.services.file_store import FileStore
+from app.services.storage_manager import storage_manager
+from app.services.featured_shelf import featured_shelf
 from app.model.book import Book as BookModel
 
 logger = logging.getLogger(__name__)
 
+# Minimum time between two progress writes for the same job
+PROGRESS_MIN_INTERVAL_SECONDS = 2.0
+
+# How often orphaned files (no matching book document) are swept from the file store
+GC_INTERVAL_SECONDS = 6 * 60 * 60
+GC_BATCH_SIZE = 500
+
 class DownloadService:
     def __init__(self, download_dir: str, secret_key: str):
         self.download_dir = download_dir
         self.secret_key = secret_key
-        if not os.path.exists(download_dir):
-            os.makedirs(download_dir, exist_ok=True)
+        self.file_store = FileStore(download_dir)
+        self.storage = storage_manager
+        self.storage.attach(self.file_store)
+        # Books this process is downloading right now — never evicted
+        self._active_hashes: set[str] = set()
+        self._last_progress_write: dict[str, float] = {}
+        # Loops and in-flight jobs, kept so shutdown can cancel them before the DB closes
+        self._tasks: set[asyncio.Task] = set()
 
     async def start_service(self):
         logger.info("Starting download service...")
-        asyncio.create_task(self.process_pending_downloads())
+        await asyncio.to_thread(self.storage.scan)
+        self._spawn(self.process_pending_downloads())
+        self._spawn(self.run_garbage_collector())
 
-    async def process_pending_downloads(self):
+    async def stop_service(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run_garbage_collector(self):
         while True:
             try:
-                # Clean up failed books older than 24 hours
-                await self.cleanup_failed_books()
+                await self.collect_garbage()
+                await self.enforce_storage_budget()
+            except Exception as e:
+                logger.error(f"Error in file store garbage collection: {e}")
+            await asyncio.sleep(GC_INTERVAL_SECONDS)
+
+    async def collect_garbage(self):
+        """Remove stored files whose md5 no longer has a book document."""
+        removed = await asyncio.to_thread(self.file_store.remove_stale_temp_files)
+
+        # Walking every shard directory is blocking I/O, do it in a worker thread
+        files = await asyncio.to_thread(lambda: list(self.file_store.iter_files()))
+
+        for start in range(0, len(files), GC_BATCH_SIZE):
+            batch = files[start:start + GC_BATCH_SIZE]
+            existing = await book_crud.find_existing_hashes([md5 for md5, _ in batch])
+            orphans = [path for md5, path in batch if md5 not in existing]
+            if not orphans:
+                continue
+            await asyncio.to_thread(self.file_store.remove_many, orphans)
+            for path in orphans:
+                self.storage.forget(path)
+            removed += len(orphans)
+
+        if removed > 0:
+            logger.info(f"Garbage collected {removed} files from the file store")
+        return removed
 
+    async def enforce_storage_budget(self):
+        """Evict least-recently-used originals while over budget, skipping books with in-flight jobs."""
+        if self.storage.max_bytes <= 0 or self.storage.total_bytes <= self.storage.max_bytes:
+            return []
+        pinned = self._active_hashes | await job_crud.get_active_job_hashes()
+        evicted = self.storage.evict(pinned)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} downloaded files to stay within the storage budget")
+        return evicted
+
+    async def process_pending_downloads(self):
+        while True:
+            try:
+                # Failed books and finished jobs expire through TTL indexes — no cleanup here
                 jobs = await job_crud.get_pending_jobs(limit=5)
                 if not jobs:
                     await asyncio.sleep(5)
@@ -34,51 +105,95 @@ class DownloadService:
 
                 for job in jobs:
                     # Run in background without blocking the loop
-                    asyncio.create_task(self.process_job(job))
+                    self._spawn(self.process_job(job))
 
                 await asyncio.sleep(2)
             except Exception as e:
                 logger.error(f"Error in download service loop: {e}")
                 await asyncio.sleep(10)
 
+    async def _report_progress(self, job: DownloadJob, progress: int):
+        """Write job progress, at most once per PROGRESS_MIN_INTERVAL_SECONDS per job."""
+        now = time.monotonic()
+        last = self._last_progress_write.get(job.id)
+        if last is not None and now - last < PROGRESS_MIN_INTERVAL_SECONDS:
+            return
+        self._last_progress_write[job.id] = now
+        await job_crud.update_job_status(job.id, DownloadStatus.DOWNLOADING, progress)
+
     async def process_job(self, job: DownloadJob):
         logger.info(f"Processing download job {job.id} for book {job.book_hash}")
+        self._active_hashes.add(job.book_hash)
 
         try:
-            await job_crud.update_job_status(job.id, DownloadStatus.DOWNLOADING, 10)
+            await self._report_progress(job, 10)
 
             book = await book_crud.get_book_by_hash(job.book_hash)
             
             if not book:
                 # Book doesn't exist, need to download it
-                await self.process_new_book(job)
+                file_path = await self.process_new_book(job, None)
             else:
                 # Book exists
                 status = book.get("status")
                 file_path = book.get("file_path")
                 
-                if status == BookStatus.READY and file_path:
-                    if os.path.exists(file_path):
-                        await job_crud.update_job_status(job.id, DownloadStatus.COMPLETED, 100)
-                        await job_crud.update_job_file_path(job.id, file_path)
-                        logger.info(f"Book {job.book_hash} already available, job {job.id} completed")
-                        return
-                    else:
-                        logger.warning(f"Book {job.book_hash} marked as ready but file missing, re-downloading")
-                        await self.process_new_book(job)
+                if status == BookStatus.READY and file_path and os.path.exists(file_path):
+                    await job_crud.complete_job(job.id, file_path)
+                    logger.info(f"Book {job.book_hash} already available, job {job.id} completed")
+                    return
+
+                if status == BookStatus.READY:
+                    # Already parsed, only the original is gone (usually evicted): fetch the file alone
+                    logger.info(f"Book {job.book_hash} is ready but its file is missing, re-downloading the file")
+                    file_path = await self.rehydrate_book_file(job, book)
                 else:
-                    # Exists but not ready
-                    await self.process_new_book(job)
+                    file_path = await self.process_new_book(job, book)
 
-            await job_crud.update_job_status(job.id, DownloadStatus.COMPLETED, 100)
+            await job_crud.complete_job(job.id, file_path)
             logger.info(f"Download job {job.id} completed successfully")
 
         except Exception as e:
             logger.error(f"Failed to process job {job.id}: {e}")
             await job_crud.update_job_status(job.id, DownloadStatus.FAILED, 0, str(e))
+        finally:
+            self._active_hashes.discard(job.book_hash)
+            self._last_progress_write.pop(job.id, None)
+
+    @staticmethod
+    def _metadata_from_book(book: dict) -> anna.Book:
+        return anna.Book(
+            hash=book.get("md5"),
+            title=book.get("title"),
+            authors=book.get("author"),
+            format=book.get("format"),
+            size=book.get("size"),
+            language=book.get("language"),
+            cover_url=book.get("cover_url")
+        )
+
+    async def rehydrate_book_file(self, job: DownloadJob, book: dict) -> str:
+        """
+        Bring back the original file of a book that is already ready. Only file_path is written:
+        chapters, status, updated_at and expire_at are left alone, so cached chapters and ETags
+        stay valid and a failed download just fails the job instead of the book.
+        """
+        # The original may still be in the store under another extension than the book records
+        file_path = await asyncio.to_thread(self.file_store.find, job.book_hash)
+        if file_path is None:
+            await self._report_progress(job, 50)
+            file_path = await self._metadata_from_book(book).download(self.secret_key, self.file_store)
+        self.storage.record(job.book_hash, file_path)
+        await book_crud.set_book_file_path(job.book_hash, file_path)
+
+        try:
+            await self.enforce_storage_budget()
+        except Exception as e:
+            logger.error(f"Error enforcing storage budget after re-downloading {job.book_hash}: {e}")
+        return file_path
 
-    async def process_new_book(self, job: DownloadJob):
-        existing_book = await book_crud.get_book_by_hash(job.book_hash)
+    async def process_new_book(self, job: DownloadJob, existing_book: dict | None) -> str:
+        """Download the file for a book and store it with its parsed chapters. Returns the file path."""
         book_metadata = None
 
         if not existing_book:
@@ -102,40 +217,17 @@ class DownloadService:
             )
             await book_crud.create_book(new_book)
         else:
-            book_metadata = anna.Book(
-                hash=existing_book.get("md5"),
-                title=existing_book.get("title"),
-                authors=existing_book.get("author"),
-                format=existing_book.get("format"),
-                size=existing_book.get("size"),
-                language=existing_book.get("language"),
-                cover_url=existing_book.get("cover_url")
-            )
+            book_metadata = self._metadata_from_book(existing_book)
 
-        await job_crud.update_job_status(job.id, DownloadStatus.DOWNLOADING, 30)
-        
-        # In the Go code, it calls annaBook.Download
-        # We'll use our version
-        await job_crud.update_job_status(job.id, DownloadStatus.DOWNLOADING, 50)
+        await self._report_progress(job, 50)
         
         try:
-            file_path = await book_metadata.download(self.secret_key, self.download_dir)
-            
-            await job_crud.update_job_status(job.id, DownloadStatus.DOWNLOADING, 90)
+            file_path = await book_metadata.download(self.secret_key, self.file_store)
+            self.storage.record(job.book_hash, file_path)
             
-            # Update book with final path and status
-            await book_crud.update_book_status(job.book_hash, BookStatus.READY)
-            
-            # Update file_path in the book document
-            collection = book_crud.database["books"]
-            await collection.update_one(
-                {"md5": job.book_hash},
-                {"$set": {"file_path": file_path, "status": BookStatus.READY}}
-            )
-
-            await job_crud.update_job_file_path(job.id, file_path)
+            await self._report_progress(job, 90)
 
-            # Parse the downloaded file into chapters and store them
+            # Parse the downloaded file into chapters and store everything in one write
             await self._parse_and_store_chapters(job.book_hash, file_path, book_metadata.format)
             
         except Exception as e:
@@ -143,8 +235,15 @@ class DownloadService:
             await book_crud.update_book_status(job.book_hash, BookStatus.ERROR, str(e))
             raise e
 
-    async def _parse_and_store_chapters(self, book_hash: str, file_path: str, format_type: str):
-        """Read a downloaded file and parse it into chapters, then store in the book document."""
+        # The book is ready from here on: a failed eviction must not flip it to error
+        try:
+            await self.enforce_storage_budget()
+        except Exception as e:
+            logger.error(f"Error enforcing storage budget after downloading {job.book_hash}: {e}")
+        return file_path
+
+    def _parse_chapters(self, book_hash: str, file_path: str, format_type: str) -> list[dict] | None:
+        """Read a downloaded file and parse it into chapter dicts. None if the format isn't parseable."""
         try:
             # Only attempt parsing for text-extractable formats
             parseable_formats = {"txt", "epub", "doc", "docx", "fb2"}
@@ -152,43 +251,48 @@ class DownloadService:
             
             if fmt not in parseable_formats:
                 logger.info(f"Format '{fmt}' not parseable into chapters for book {book_hash}, skipping")
-                return
+                return None
 
-            # Read the file content
-            import os
             if not os.path.exists(file_path):
                 logger.warning(f"File not found for chapter parsing: {file_path}")
-                return
+                return None
 
             with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
                 content = f.read()
 
             if not content.strip():
                 logger.warning(f"Empty file content for book {book_hash}")
-                return
+                return None
 
-            # Parse into chapters
             service = anna.AnnasArchiveService()
             chapters = service.parse_book_content_to_chapters(content, fmt)
-
-            if chapters:
-                chapter_dicts = [
-                    {"title": ch.title, "content": ch.content, "order": ch.order}
-                    for ch in chapters
-                ]
-                # Find the book by hash and update its chapters
-                book = await book_crud.get_book_by_hash(book_hash)
-                if book:
-                    await book_crud.update_book_chapters(book["_id"], chapter_dicts)
-                    logger.info(f"Parsed {len(chapters)} chapters for book {book_hash}")
-            else:
+            if not chapters:
                 logger.info(f"No chapters parsed for book {book_hash}")
+                return None
+
+            return [
+                {"title": ch.title, "content": ch.content, "order": ch.order}
+                for ch in chapters
+            ]
 
         except Exception as e:
             logger.error(f"Chapter parsing error for book {book_hash}: {e}")
+            return None
 
-    async def cleanup_failed_books(self):
-        cutoff_time = (datetime.now() - timedelta(hours=24)).timestamp()
-        result = await book_crud.delete_failed_books(cutoff_time)
-        if result > 0:
-            logger.info(f"Cleaned up {result} failed books")
+    async def _parse_and_store_chapters(self, book_hash: str, file_path: str, format_type: str):
+        """
+        Parse the downloaded file, then record file_path, ready status and chapters
+        on the book in a single write, and index the chapter text for search.
+        """
+        # Reading and splitting a whole book is CPU-bound, keep it off the event loop
+        chapter_dicts = await asyncio.to_thread(self._parse_chapters, book_hash, file_path, format_type)
+
+        book_id = await book_crud.finalize_book_download(book_hash, file_path, chapter_dicts)
+        featured_shelf.mark_stale()
+        if book_id and chapter_dicts:
+            logger.info(f"Parsed {len(chapter_dicts)} chapters for book {book_hash}")
+            # Best effort: the book is already stored and ready, search can be rebuilt later
+            try:
+                await search_index.index_book_chapters(book_id, chapter_dicts)
+            except Exception as e:
+                logger.error(f"Error indexing chapters for book {book_hash}: {e}")
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import logging
+from app.crud import shelves as shelf_crud
+
+logger = logging.getLogger(__name__)
+
+# Catalogue changes arriving within this window are folded into a single refresh
+DEBOUNCE_SECONDS = 5
+
+
+class FeaturedShelfService:
+    """Keeps the materialized featured shelf fresh: on a timer, and soon after catalogue changes."""
+
+    def __init__(self, rule: str, limit: int, refresh_seconds: float):
+        if rule not in shelf_crud.FEATURED_RULES:
+            raise ValueError(f"Unknown featured shelf rule: {rule}")
+        self.rule = rule
+        self.limit = limit
+        self.refresh_seconds = refresh_seconds
+        self._stale = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start_service(self):
+        logger.info(f"Starting featured shelf service (rule={self.rule}, limit={self.limit})...")
+        self._task = asyncio.create_task(self.run())
+
+    async def stop_service(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def mark_stale(self):
+        """Called when books are added, edited or removed."""
+        self._stale.set()
+
+    async def refresh(self):
+        return await shelf_crud.refresh_featured_shelf(self.rule, self.limit)
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing featured shelf: {e}")
+
+            try:
+                await asyncio.wait_for(self._stale.wait(), timeout=self.refresh_seconds)
+                await asyncio.sleep(DEBOUNCE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._stale.clear()
+
+
+# Shared instance: started from the app lifespan, poked by the API on catalogue changes
+featured_shelf = FeaturedShelfService(
+    rule=os.getenv("FEATURED_RULE", shelf_crud.RULE_ALPHABETICAL),
+    limit=int(os.getenv("FEATURED_LIMIT", "24")),
+    refresh_seconds=float(os.getenv("FEATURED_REFRESH_SECONDS", "900")),
+)
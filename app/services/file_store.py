@@ -0,0 +1,155 @@
+import os
+import re
+import asyncio
+import hashlib
+import tempfile
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_MD5_RE = re.compile(r"^[0-9a-f]{32}$")
+_EXT_RE = re.compile(r"^[0-9a-z]{1,10}$")
+TMP_PREFIX = ".tmp-"
+STALE_TMP_SECONDS = 3600   # partial downloads older than this are abandoned
+WRITE_BUFFER_BYTES = 1024 * 1024   # chunks are gathered up to this size per disk write
+
+
+class ChecksumMismatch(ValueError):
+    """The downloaded bytes don't hash to the md5 they were stored under."""
+
+
+class FileStore:
+    """
+    Content-addressed storage for downloaded book files.
+
+    Files are keyed by md5 and sharded two levels deep, so no directory grows without bound:
+        {root}/ab/cd/abcd0123...{md5}.{ext}
+    Writes go to a temp file in the destination shard and are renamed into place,
+    so readers never see a half-written file. Content is hashed while it streams in and
+    only kept if it matches its md5 key.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def _normalize(md5: str) -> str:
+        md5 = (md5 or "").lower()
+        if not _MD5_RE.match(md5):
+            raise ValueError(f"Not a valid md5 hash: {md5!r}")
+        return md5
+
+    def shard_dir(self, md5: str) -> str:
+        md5 = self._normalize(md5)
+        return os.path.join(self.root, md5[:2], md5[2:4])
+
+    def path_for(self, md5: str, ext: str) -> str:
+        ext = (ext or "bin").lower().lstrip(".")
+        if not _EXT_RE.match(ext):
+            ext = "bin"
+        return os.path.join(self.shard_dir(md5), f"{self._normalize(md5)}.{ext}")
+
+    def find(self, md5: str) -> str | None:
+        """Return the stored path for this hash, whatever its extension, or None."""
+        md5 = self._normalize(md5)
+        shard = self.shard_dir(md5)
+        try:
+            for name in os.listdir(shard):
+                if name.startswith(md5 + "."):
+                    return os.path.join(shard, name)
+        except FileNotFoundError:
+            pass
+        return None
+
+    async def write_stream(self, md5: str, ext: str, chunks) -> str:
+        """
+        Write an async iterator of byte chunks atomically to the hash's path. Returns the path.
+        All disk I/O (writes, fsync, rename) runs in a worker thread, never on the event loop.
+        Raises ChecksumMismatch, keeping nothing, if the bytes don't hash to `md5`.
+        """
+        md5 = self._normalize(md5)
+        final_path = self.path_for(md5, ext)
+        digest = hashlib.md5()
+        fd, tmp_path = await asyncio.to_thread(self._create_temp, os.path.dirname(final_path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                buffer = bytearray()
+                async for chunk in chunks:
+                    buffer += chunk
+                    if len(buffer) >= WRITE_BUFFER_BYTES:
+                        data, buffer = buffer, bytearray()
+                        await asyncio.to_thread(self._write_chunk, f, digest, data)
+                await asyncio.to_thread(self._finish_write, f, digest, buffer)
+            if digest.hexdigest() != md5:
+                raise ChecksumMismatch(f"Downloaded file hashes to {digest.hexdigest()}, expected {md5}")
+            await asyncio.to_thread(os.replace, tmp_path, final_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return final_path
+
+    @staticmethod
+    def _create_temp(shard: str) -> tuple[int, str]:
+        os.makedirs(shard, exist_ok=True)
+        return tempfile.mkstemp(dir=shard, prefix=TMP_PREFIX)
+
+    @staticmethod
+    def _write_chunk(f, digest, data: bytes):
+        digest.update(data)
+        f.write(data)
+
+    @classmethod
+    def _finish_write(cls, f, digest, remaining: bytes):
+        if remaining:
+            cls._write_chunk(f, digest, remaining)
+        f.flush()
+        os.fsync(f.fileno())
+
+    def remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def remove_many(self, paths: list[str]):
+        for path in paths:
+            self.remove(path)
+
+    def iter_files(self):
+        """Yield (md5, path) for every stored file. Temp files are skipped."""
+        for top in sorted(os.listdir(self.root)):
+            top_path = os.path.join(self.root, top)
+            if len(top) != 2 or not os.path.isdir(top_path):
+                continue  # legacy flat files and anything else outside the shards
+            for sub in sorted(os.listdir(top_path)):
+                sub_path = os.path.join(top_path, sub)
+                if not os.path.isdir(sub_path):
+                    continue
+                for name in os.listdir(sub_path):
+                    if name.startswith(TMP_PREFIX):
+                        continue
+                    md5 = name.split(".", 1)[0]
+                    if _MD5_RE.match(md5):
+                        yield md5, os.path.join(sub_path, name)
+
+    def remove_stale_temp_files(self) -> int:
+        """Delete temp files left behind by crashed downloads."""
+        removed = 0
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.startswith(TMP_PREFIX):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
@@ -0,0 +1,105 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit(NamedTuple):
+    """Token bucket shape: bursts of up to `capacity`, refilled at `capacity` per `period_seconds`."""
+    capacity: int
+    period_seconds: float
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period_seconds
+
+
+class InMemoryRateLimiter:
+    """
+    Token buckets kept in this process. Good for a single API instance.
+    The number of tracked keys is bounded; the least recently seen bucket is dropped first
+    (a dropped bucket simply starts full again).
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill timestamp)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def hit(self, key: str, limit: RateLimit) -> float:
+        """Take one token. Returns 0 if allowed, otherwise seconds until a token is available."""
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key, (float(limit.capacity), now))
+        tokens = min(float(limit.capacity), tokens + (now - last) * limit.refill_per_second)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / limit.refill_per_second
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+# Atomic refill-and-take on a Redis hash, so every API instance shares the same buckets
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimiter:
+    """Token buckets in Redis, shared across API instances. Fails open if Redis is unreachable."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        # Imported lazily so the in-memory backend works without a Redis server configured
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def hit(self, key: str, limit: RateLimit) -> float:
+        try:
+            result = await self._script(
+                keys=[self.prefix + key],
+                args=[limit.capacity, limit.refill_per_second, time.time()],
+            )
+            return float(result)
+        except Exception as e:
+            logger.warning(f"Rate limiter backend unavailable, allowing request: {e}")
+            return 0.0
+
+
+def build_rate_limiter():
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "redis":
+        return RedisRateLimiter(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    if backend != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+    return InMemoryRateLimiter()
+
+
+# Shared instance used by the auth endpoints
+rate_limiter = build_rate_limiter()
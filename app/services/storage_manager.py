@@ -0,0 +1,104 @@
+import os
+import time
+import logging
+from app.services.file_store import FileStore
+
+logger = logging.getLogger(__name__)
+
+
+class StorageManager:
+    """
+    Keeps the file store within a byte budget by evicting least-recently-used originals.
+
+    Last access is tracked in memory and mirrored to each file's atime (set explicitly with
+    os.utime, so it works on noatime mounts too), which lets the order survive restarts.
+    Evicted books are re-downloaded on demand by the download pipeline.
+    A budget of 0 disables eviction.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.store: FileStore | None = None
+        self.total_bytes = 0
+        # path -> (md5, size, last_access)
+        self._files: dict[str, tuple[str, int, float]] = {}
+
+    def attach(self, store: FileStore):
+        self.store = store
+
+    def scan(self):
+        """Rebuild the index from disk. Called once at startup."""
+        self._files.clear()
+        self.total_bytes = 0
+        if self.store is None:
+            return
+        for md5, path in self.store.iter_files():
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            self._files[path] = (md5, st.st_size, max(st.st_atime, st.st_mtime))
+            self.total_bytes += st.st_size
+        logger.info(f"Storage manager tracking {len(self._files)} files, {self.total_bytes} bytes")
+
+    def record(self, md5: str, path: str):
+        """Register a newly written file."""
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        self.forget(path)
+        self._files[path] = (md5, size, time.time())
+        self.total_bytes += size
+
+    def touch(self, path: str):
+        """Mark a file as just used."""
+        entry = self._files.get(path)
+        if entry is None:
+            return
+        now = time.time()
+        md5, size, _ = entry
+        self._files[path] = (md5, size, now)
+        try:
+            os.utime(path, (now, os.stat(path).st_mtime))
+        except OSError:
+            pass
+
+    def forget(self, path: str):
+        entry = self._files.pop(path, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def evict(self, pinned_hashes: set[str]) -> list[str]:
+        """Delete least-recently-used files until under budget, never touching pinned hashes."""
+        if self.max_bytes <= 0 or self.total_bytes <= self.max_bytes:
+            return []
+
+        evicted = []
+        by_age = sorted(self._files.items(), key=lambda item: item[1][2])
+        for path, (md5, _, _) in by_age:
+            if self.total_bytes <= self.max_bytes:
+                break
+            if md5 in pinned_hashes:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict {path}: {e}")
+                continue
+            self.forget(path)
+            evicted.append(md5)
+        return evicted
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self._files),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# Shared instance: the download service attaches its file store, the API reports file reads
+storage_manager = StorageManager(int(os.getenv("DOWNLOAD_DIR_MAX_BYTES", "0")))
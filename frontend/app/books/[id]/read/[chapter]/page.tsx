@@ -2,26 +2,57 @@
 
 import { useEffect, useState, use } from "react";
 import Link from "next/link";
-import { getChapter, Chapter } from "@/lib/api";
+import { getChapterRange, saveReadingProgress, Chapter } from "@/lib/api";
+
+// How many chapters past the current one to keep loaded
+const READ_AHEAD = 2;
+
+// Chapters survive client-side navigation, so sequential page turns render instantly
+const chapterStore = new Map<string, Chapter>();
+const chapterKey = (bookId: string, order: number) => `${bookId}:${order}`;
+
+async function loadChapters(bookId: string, start: number, count: number) {
+  const chapters = await getChapterRange(bookId, start, count);
+  chapters.forEach((ch) => chapterStore.set(chapterKey(bookId, ch.order), ch));
+}
 
 export default function ChapterReaderPage({ params }: { params: Promise<{ id: string, chapter: string }> }) {
   const { id, chapter: chapterOrderStr } = use(params);
   const chapterOrder = parseInt(chapterOrderStr, 10);
-  const [chapter, setChapter] = useState<Chapter | null>(null);
-  const [loading, setLoading] = useState(true);
+  const [chapter, setChapter] = useState<Chapter | null>(
+    () => chapterStore.get(chapterKey(id, chapterOrder)) ?? null
+  );
+  const [loading, setLoading] = useState(!chapter);
   const [error, setError] = useState("");
 
   useEffect(() => {
     async function fetchData() {
       try {
-        const data = await getChapter(id, chapterOrder);
+        let data = chapterStore.get(chapterKey(id, chapterOrder));
+        if (!data) {
+          setLoading(true);
+          await loadChapters(id, chapterOrder, READ_AHEAD + 1);
+          data = chapterStore.get(chapterKey(id, chapterOrder));
+        }
+        if (!data) throw new Error("Chapter not found");
         setChapter(data);
+        setError("");
+        // Best effort: anonymous readers simply have no progress to save
+        saveReadingProgress(id, chapterOrder).catch(() => {});
       } catch (err) {
         console.error("Failed to load chapter", err);
         setError("Chapter not found.");
       } finally {
         setLoading(false);
       }
+
+      // Read ahead in the background so the next page turn needs no round trip
+      for (let order = chapterOrder + 1; order <= chapterOrder + READ_AHEAD; order++) {
+        if (!chapterStore.has(chapterKey(id, order))) {
+          loadChapters(id, order, READ_AHEAD + 1).catch(() => {});
+          break;
+        }
+      }
     }
     fetchData();
   }, [id, chapterOrder]);
@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from "react";
 import Link from "next/link";
-import { getMyReaderProfile, getBooksBatch, Book, Reader } from "@/lib/api";
+import { getMyShelves, Book } from "@/lib/api";
 import BookCard from "@/components/BookCard";
 import BookGrid from "@/components/BookGrid";
 
@@ -18,29 +18,12 @@ export default function ReaderLists() {
     useEffect(() => {
         async function fetchData() {
             try {
-                const profile = await getMyReaderProfile();
-
-                // Collect all unique book IDs from all lists
-                const allIds = new Set([
-                    ...profile.favorites,
-                    ...profile.in_progress,
-                    ...profile.finished
-                ]);
-
-                if (allIds.size === 0) {
-                    setLoading(false);
-                    return;
-                }
-
-                // Fetch book details for all IDs in one batch
-                const books = await getBooksBatch(Array.from(allIds));
-                const bookMap = new Map(books.map(b => [b._id, b]));
-
-                // Map back to lists
+                // The API returns each list already hydrated, in order
+                const shelves = await getMyShelves();
                 setLists({
-                    favorites: profile.favorites.map(id => bookMap.get(id)).filter((b): b is Book => !!b),
-                    in_progress: profile.in_progress.map(id => bookMap.get(id)).filter((b): b is Book => !!b),
-                    finished: profile.finished.map(id => bookMap.get(id)).filter((b): b is Book => !!b),
+                    favorites: shelves.favorites,
+                    in_progress: shelves.in_progress,
+                    finished: shelves.finished,
                 });
             } catch (err) {
                 console.error("Failed to load reader lists", err);
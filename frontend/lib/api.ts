@@ -24,6 +24,11 @@ export interface Book {
     cover_url?: string;
 }
 
+// Fields PATCH /books/{id} accepts (mirrors BookUpdate on the backend)
+export type BookUpdate = Partial<Pick<Book,
+    "title" | "author" | "biography" | "description" | "image" | "cover_url" |
+    "language" | "publisher" | "year" | "isbn">>;
+
 export interface ExternalBook {
     title: string;
     authors: string;
@@ -58,6 +63,7 @@ export interface Reader {
     in_progress: string[];
     finished: string[];
     user_id?: string;
+    progress?: Record<string, { c: number, o: number }>;  // book id -> chapter order, offset
 }
 
 // --- Helper wrapper for fetch calls ---
@@ -154,6 +160,11 @@ export async function getChapter(bookId: string, order: number): Promise<Chapter
     return fetchWithAuth(`/books/${bookId}/chapters/${order}`);
 }
 
+// Several consecutive chapters in one request (current + read-ahead)
+export async function getChapterRange(bookId: string, start: number, count: number = 3): Promise<Chapter[]> {
+    return fetchWithAuth(`/books/${bookId}/chapters?start=${start}&count=${count}`);
+}
+
 export async function createBook(bookData: Partial<Book>) {
     return fetchWithAuth("/books/", {
         method: "POST",
@@ -161,9 +172,10 @@ export async function createBook(bookData: Partial<Book>) {
     });
 }
 
-export async function updateBook(id: string, bookData: Partial<Book>) {
+// Partial update: only the fields sent are written, chapters are never rewritten
+export async function updateBook(id: string, bookData: BookUpdate) {
     return fetchWithAuth(`/books/${id}`, {
-        method: "PUT",
+        method: "PATCH",
         body: JSON.stringify(bookData),
     });
 }
@@ -183,8 +195,8 @@ export async function getMyAuthorProfile(): Promise<Author> {
     return fetchWithAuth("/authors/me");
 }
 
-export async function getAuthorBooks(id: string): Promise<{ books: Book[], author: string }> {
-    return fetchWithAuth(`/authors/${id}/books`);
+export async function getAuthorBooks(id: string, skip: number = 0, limit: number = 50): Promise<{ books: Book[], author: string, skip: number, limit: number }> {
+    return fetchWithAuth(`/authors/${id}/books?skip=${skip}&limit=${limit}`);
 }
 
 export async function updateAuthor(id: string, data: Partial<Author>) {
@@ -203,6 +215,19 @@ export async function getMyReaderProfile(): Promise<Reader> {
     return fetchWithAuth("/readers/me");
 }
 
+// All three reader lists with their books already filled in (one request)
+export async function getMyShelves(): Promise<{ reader_id: string, favorites: Book[], in_progress: Book[], finished: Book[] }> {
+    return fetchWithAuth("/readers/me/shelves");
+}
+
+// Remember where the user is in a book (one small write, fine to call on every page turn)
+export async function saveReadingProgress(bookId: string, chapter: number, offset: number = 0) {
+    return fetchWithAuth(`/readers/me/progress/${bookId}`, {
+        method: "PUT",
+        body: JSON.stringify({ chapter, offset }),
+    });
+}
+
 export async function getReader(id: string): Promise<Reader> {
     return fetchWithAuth(`/readers/${id}`);
 }
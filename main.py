@@ -1,6 +1,10 @@
 import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 
 # Load environment variables from .env file if it exists
 load_dotenv()
@@ -10,7 +14,71 @@ from api.books import router as book_router
 from api.readers import router as reader_router
 from api.auth import router as auth_router
 
-app = FastAPI()
+from app.db.database import connect_db, close_db, ping_db
+from app.responses import OrjsonResponse
+from app.services.download_service import DownloadService
+from app.services.featured_shelf import featured_shelf
+from app.crud import books, download_jobs, search_index, user, readers, authors
+
+logger = logging.getLogger(__name__)
+
+# Initialize Download Service
+download_dir = os.getenv("DOWNLOAD_DIR", "downloads")
+secret_key = os.getenv("ANNAS_SECRET_KEY", "")
+download_service = DownloadService(download_dir, secret_key)
+
+# Backoff while waiting for MongoDB at startup
+DB_RETRY_INITIAL_SECONDS = 1
+DB_RETRY_MAX_SECONDS = 30
+
+# Set once the database answered and indexes + background services are up
+_backend_ready = False
+
+
+async def start_backend():
+    """
+    Wait for MongoDB with exponential backoff, then create indexes and start the background
+    services. Runs beside the server so the API boots even if the database comes up later;
+    /ready reports 503 until this has finished.
+    """
+    global _backend_ready
+    delay = DB_RETRY_INITIAL_SECONDS
+    while True:
+        try:
+            # Also opens the first pooled connections
+            await ping_db()
+            await books.ensure_indexes()
+            await download_jobs.ensure_indexes()
+            await search_index.ensure_indexes()
+            await user.ensure_indexes()
+            await readers.ensure_indexes()
+            await authors.ensure_indexes()
+            break
+        except Exception as e:
+            logger.warning(f"Database not ready ({e}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, DB_RETRY_MAX_SECONDS)
+
+    await download_service.start_service()
+    await featured_shelf.start_service()
+    _backend_ready = True
+    logger.info("Backend ready")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the Mongo client from config; connecting happens in start_backend
+    connect_db()
+    startup = asyncio.create_task(start_backend())
+    yield
+    # Stop everything that could still touch the database before closing the client
+    startup.cancel()
+    await asyncio.gather(startup, return_exceptions=True)
+    await download_service.stop_service()
+    await featured_shelf.stop_service()
+    close_db()
+
+app = FastAPI(lifespan=lifespan, default_response_class=OrjsonResponse)
 
 # Load origins from .env or default to local development ports
 cors_origins_raw = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:3001,http://localhost:3004,http://localhost:3005")
@@ -25,17 +93,6 @@ app.add_middleware(
 )
 
 
-from app.services.download_service import DownloadService
-
-# Initialize Download Service
-download_dir = os.getenv("DOWNLOAD_DIR", "downloads")
-secret_key = os.getenv("ANNAS_SECRET_KEY", "")
-download_service = DownloadService(download_dir, secret_key)
-
-@app.on_event("startup")
-async def startup_event():
-    await download_service.start_service()
-
 app.include_router(author_router)
 app.include_router(book_router)
 app.include_router(reader_router)
@@ -45,3 +102,15 @@ app.include_router(auth_router)
 @app.get("/")
 def home():
     return {"status" : "Backend is successfully up!"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: only reports ready once startup finished and MongoDB answers a ping."""
+    if not _backend_ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "database": "connecting"})
+    try:
+        await ping_db()
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {e}")
+        return JSONResponse(status_code=503, content={"status": "unavailable", "database": "unreachable"})
+    return {"status": "ready", "database": "ok"}
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""
+Set expire_at on error books and finished download jobs created before the TTL indexes.
+
+Usage:
+    python scripts/backfill_expire_at.py
+
+Run once after deploying the TTL indexes. Each collection is scanned for documents without
+expire_at, so this is deliberately kept out of startup. Matching documents get the usual
+grace period (FAILED_BOOK_TTL / FINISHED_JOB_TTL) from now.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from app.crud import books, download_jobs  # noqa: E402
+
+
+async def main():
+    print(f"books: {await books.backfill_expire_at()} error books now expire in {books.FAILED_BOOK_TTL}")
+    print(f"download_jobs: {await download_jobs.backfill_expire_at()} finished jobs now expire in {download_jobs.FINISHED_JOB_TTL}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+"""
+Measure bcrypt cost on this host to pick BCRYPT_ROUNDS.
+
+Usage:
+    python scripts/bench_bcrypt.py [min_rounds] [max_rounds]
+
+Prints milliseconds per hash for each cost factor (default 10..14) and the hashes/second a
+single worker can sustain. Login throughput is roughly that figure times PASSWORD_HASH_WORKERS.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from passlib.context import CryptContext  # noqa: E402
+from app.auth_utils import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+TARGET_SECONDS = 1.0
+
+
+def time_rounds(rounds: int) -> float:
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    context.hash(PASSWORD)  # warm up the backend
+
+    samples = 0
+    start = time.perf_counter()
+    while samples < 3 or time.perf_counter() - start < TARGET_SECONDS:
+        context.hash(PASSWORD)
+        samples += 1
+    return (time.perf_counter() - start) * 1000 / samples
+
+
+def main():
+    low = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    high = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+
+    print(f"current BCRYPT_ROUNDS={BCRYPT_ROUNDS}, PASSWORD_HASH_WORKERS={PASSWORD_HASH_WORKERS}")
+    print(f"{'rounds':>6} {'ms/hash':>10} {'hashes/s/worker':>16} {'hashes/s total':>15}")
+    for rounds in range(low, high + 1):
+        ms = time_rounds(rounds)
+        per_worker = 1000 / ms
+        marker = "  <- current" if rounds == BCRYPT_ROUNDS else ""
+        print(f"{rounds:>6} {ms:>10.1f} {per_worker:>16.1f} {per_worker * PASSWORD_HASH_WORKERS:>15.1f}{marker}")
+
+
+if __name__ == "__main__":
+    main()
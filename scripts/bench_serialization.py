@@ -0,0 +1,82 @@
+"""
+Benchmark response serialization: FastAPI's default path vs the orjson fast path.
+
+Usage:
+    python scripts/bench_serialization.py
+
+Measures a 1000-card book list (list_books / get_books_by_ids shape) and a ~1 MB chapter
+(get_chapter shape). "default" is jsonable_encoder + json.dumps exactly as FastAPI's
+JSONResponse does it; "orjson" is OrjsonResponse rendering the raw documents.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from app.responses import OrjsonResponse  # noqa: E402
+
+
+def make_cards(n: int = 1000) -> list[dict]:
+    return [
+        {
+            "_id": f"{i:024x}",
+            "title": f"Book title number {i}",
+            "author": "Some Author",
+            "description": "A fairly ordinary description of a book. " * 5,
+            "image": f"https://covers.example.org/{i}.jpg",
+            "cover_url": f"https://covers.example.org/{i}.jpg",
+            "source": "external",
+            "md5": f"{i:032x}",
+            "format": "epub",
+            "size": "1.2MB",
+            "language": "English",
+            "publisher": "Publisher",
+            "year": "2001",
+            "isbn": "9780000000000",
+            "status": "ready",
+            "error_message": None,
+            "file_path": None,
+            "created_at": 1700000000.0 + i,
+            "updated_at": 1700000000.0 + i,
+        }
+        for i in range(n)
+    ]
+
+
+def make_chapter(size: int = 1024 * 1024) -> dict:
+    paragraph = "It was a quiet evening and the lamps along the river were coming on one by one.\n"
+    return {"title": "Chapter 1", "order": 1, "content": paragraph * (size // len(paragraph))}
+
+
+def default_render(content) -> bytes:
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def orjson_render(content) -> bytes:
+    return OrjsonResponse(content).body
+
+
+def bench(fn, content, rounds: int) -> float:
+    fn(content)  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(content)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def main():
+    cases = [("1000-card list", make_cards(), 50), ("1 MB chapter", make_chapter(), 50)]
+    for name, content, rounds in cases:
+        default_ms = bench(default_render, content, rounds)
+        orjson_ms = bench(orjson_render, content, rounds)
+        print(f"{name:16} default: {default_ms:8.3f} ms   orjson: {orjson_ms:8.3f} ms   "
+              f"speedup: {default_ms / orjson_ms:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
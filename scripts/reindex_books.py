@@ -0,0 +1,40 @@
+"""
+Rebuild the chapter search index.
+
+Usage:
+    python scripts/reindex_books.py [book_id ...]
+
+With no arguments every ready book that has stored chapters is re-indexed (use this once
+to backfill books created or downloaded before indexing existed). Safe to run while the
+API is up: each book's entries are upserted in place.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from app.crud.books import iter_book_ids_with_chapters  # noqa: E402
+from app.crud.search_index import reindex_book  # noqa: E402
+
+
+async def main(book_ids: list[str]):
+    if not book_ids:
+        book_ids = [book_id async for book_id in iter_book_ids_with_chapters()]
+
+    start = time.perf_counter()
+    failed = 0
+    for i, book_id in enumerate(book_ids, 1):
+        try:
+            terms = await reindex_book(book_id)
+            print(f"[{i}/{len(book_ids)}] {book_id}: {terms} terms")
+        except Exception as e:
+            failed += 1
+            print(f"[{i}/{len(book_ids)}] {book_id}: failed ({e})")
+
+    print(f"Re-indexed {len(book_ids) - failed} books in {time.perf_counter() - start:.1f}s, {failed} failed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))